@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+# Price alerts evaluated against each new snapshot. Rules are kept in sorted
+# per-symbol threshold indexes, so a tick only touches the rules whose threshold
+# lies between the previous and the current value: the cost follows the number
+# of fired rules, not the number of registered ones.
+
+ALERTS_FILE = os.getenv("BOT_ALERTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alerts.json"))
+ALERT_COOLDOWN = 60 * 60  # A rule fires at most once per cooldown
+MAX_ALERTS_PER_CHAT = 10  # Per evaluation, the rest is summarized in one line
+
+SUFFIXES = {'k': 1e3, 'm': 1e6, 'b': 1e9}
+WINDOWS = {'m': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+LEVEL_RULE = re.compile(r'^\s*(\S+)\s+(above|below|crosses)\s+([\d.]+)\s*([kmb]?)\s*$', re.IGNORECASE)
+MOVE_RULE = re.compile(r'^\s*(\S+)\s+(\+|-|±|\+/-)?\s*([\d.]+)\s*%\s+in\s+(\d+)\s*([mhd])\s*$', re.IGNORECASE)
+
+
+# Helper function to normalize symbols such as "usd→mdl" to "USD/MDL"
+def normalize_symbol(symbol):
+    return symbol.replace('→', '/').replace('->', '/').upper()
+
+
+# Function to parse a rule such as "BTC crosses 70k", "PEPE ±10% in 1h" or "USD→MDL above 18"
+def parse_rule(text):
+    match = LEVEL_RULE.match(text)
+    if match:
+        symbol, kind, number, suffix = match.groups()
+        return {
+            'symbol': normalize_symbol(symbol),
+            'kind': kind.lower(),
+            'threshold': float(number) * SUFFIXES.get(suffix.lower(), 1),
+        }
+
+    match = MOVE_RULE.match(text)
+    if match:
+        symbol, sign, number, window, unit = match.groups()
+        return {
+            'symbol': normalize_symbol(symbol),
+            'kind': 'move',
+            'threshold': float(number),
+            'direction': {'+': 'up', '-': 'down'}.get(sign, 'both'),
+            'window': int(window) * WINDOWS[unit.lower()],
+        }
+
+    raise ValueError(f"Cannot parse alert rule: {text}")
+
+
+# Helper function to format a window in seconds as e.g. "1h" or "30m"
+def format_window(seconds):
+    for unit, size in sorted(WINDOWS.items(), key=lambda item: -item[1]):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+# Helper function to describe a rule, e.g. for listing them
+def describe_rule(rule):
+    if rule['kind'] == 'move':
+        sign = {'up': '+', 'down': '-'}.get(rule['direction'], '±')
+        return f"{rule['symbol']} {sign}{rule['threshold']:g}% in {format_window(rule['window'])}"
+    return f"{rule['symbol']} {rule['kind']} {rule['threshold']:g}"
+
+
+# Class to keep the registered rules in a JSON file
+class AlertRegistry:
+    def __init__(self, path=ALERTS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, rules):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(rules, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # Function to register a rule for a chat, returns the stored rule
+    def add(self, chat_id, text):
+        rule = parse_rule(text)
+        with self.lock:
+            rules = self.load()
+            rule['id'] = max((r['id'] for r in rules), default=0) + 1
+            rule['chat_id'] = str(chat_id)
+            rules.append(rule)
+            self._save(rules)
+        return rule
+
+    def remove(self, rule_id):
+        with self.lock:
+            rules = self.load()
+            kept = [rule for rule in rules if rule['id'] != rule_id]
+            if len(kept) != len(rules):
+                self._save(kept)
+            return len(kept) != len(rules)
+
+
+# Class holding the sorted threshold indexes and the evaluation state
+class AlertEngine:
+    def __init__(self, rules, state=None):
+        self.rules = {rule['id']: rule for rule in rules}
+        # symbol -> sorted [(threshold, rule id)] for upward and downward level crossings
+        self.up_levels = {}
+        self.down_levels = {}
+        # (symbol, window) -> sorted [(threshold, rule id)] for upward and downward moves
+        self.up_moves = {}
+        self.down_moves = {}
+        self.windows = {}
+        for rule in rules:
+            self._index(rule)
+        for index in (self.up_levels, self.down_levels, self.up_moves, self.down_moves):
+            for entries in index.values():
+                entries.sort()
+
+        state = state or {}
+        self.last_values = state.get('last_values', {})
+        self.last_moves = state.get('last_moves', {})
+        self.last_fired = {int(rule_id): at for rule_id, at in state.get('last_fired', {}).items()}
+
+    def _index(self, rule):
+        entry = (rule['threshold'], rule['id'])
+        if rule['kind'] == 'move':
+            key = (rule['symbol'], rule['window'])
+            self.windows.setdefault(rule['symbol'], set()).add(rule['window'])
+            if rule['direction'] in ('up', 'both'):
+                self.up_moves.setdefault(key, []).append(entry)
+            if rule['direction'] in ('down', 'both'):
+                self.down_moves.setdefault(key, []).append(entry)
+            return
+        if rule['kind'] in ('above', 'crosses'):
+            self.up_levels.setdefault(rule['symbol'], []).append(entry)
+        if rule['kind'] in ('below', 'crosses'):
+            self.down_levels.setdefault(rule['symbol'], []).append(entry)
+
+    # Function to export the state that must survive between runs
+    def state(self, now=None):
+        now = now or time.time()
+        return {
+            'last_values': self.last_values,
+            'last_moves': self.last_moves,
+            'last_fired': {
+                str(rule_id): at for rule_id, at in self.last_fired.items() if now - at < ALERT_COOLDOWN
+            },
+        }
+
+    # Function to list the (symbol, window) pairs that move rules need a change for
+    def move_windows(self):
+        return [(symbol, window) for symbol, windows in self.windows.items() for window in sorted(windows)]
+
+    # Function to collect index entries whose threshold lies in (low, high]
+    @staticmethod
+    def _crossed_up(index, low, high):
+        return index[bisect_right(index, (low, float('inf'))):bisect_right(index, (high, float('inf')))]
+
+    # Function to collect index entries whose threshold lies in [low, high)
+    @staticmethod
+    def _crossed_down(index, low, high):
+        return index[bisect_left(index, (low, float('-inf'))):bisect_left(index, (high, float('-inf')))]
+
+    # Function to evaluate a tick. `values` maps symbols to current values and `changes`
+    # maps (symbol, window) to the percent change over that window, see move_windows().
+    # Returns the fired rules as (rule, message) pairs, after cooldown deduplication.
+    def evaluate(self, values, changes=None, now=None):
+        now = now or time.time()
+        candidates = []
+
+        for symbol, current in values.items():
+            previous = self.last_values.get(symbol)
+            self.last_values[symbol] = current
+            if previous is None or current == previous:
+                continue
+            if current > previous:
+                for _, rule_id in self._crossed_up(self.up_levels.get(symbol, []), previous, current):
+                    candidates.append((rule_id, f"{symbol} crossed above {self.rules[rule_id]['threshold']:g} (now {current:g})"))
+            else:
+                for _, rule_id in self._crossed_down(self.down_levels.get(symbol, []), current, previous):
+                    candidates.append((rule_id, f"{symbol} crossed below {self.rules[rule_id]['threshold']:g} (now {current:g})"))
+
+        for (symbol, window), change in (changes or {}).items():
+            key = f"{symbol}@{window}"
+            previous = self.last_moves.get(key) or 0.0
+            self.last_moves[key] = change
+            if change is None:
+                continue
+            text = f"{symbol} moved {change:+.2f}% in {format_window(window)} (now {values.get(symbol, 0):g})"
+            if change > previous:
+                fired = self._crossed_up(self.up_moves.get((symbol, window), []), max(previous, 0.0), change)
+            else:
+                fired = self._crossed_up(self.down_moves.get((symbol, window), []), max(-previous, 0.0), -change)
+            candidates.extend((rule_id, text) for _, rule_id in fired)
+
+        fired = []
+        for rule_id, text in candidates:
+            if now - self.last_fired.get(rule_id, 0) < ALERT_COOLDOWN:
+                continue
+            self.last_fired[rule_id] = now
+            fired.append((self.rules[rule_id], text))
+        return fired
+
+
+# Function to turn fired rules into one message per chat, rate-limited per chat
+def build_alert_messages(fired):
+    by_chat = {}
+    for rule, text in fired:
+        by_chat.setdefault(rule['chat_id'], []).append(text)
+
+    messages = {}
+    for chat_id, texts in by_chat.items():
+        texts = list(dict.fromkeys(texts))  # Several rules can describe the same move
+        lines = [f"🚨 {text}" for text in texts[:MAX_ALERTS_PER_CHAT]]
+        if len(texts) > MAX_ALERTS_PER_CHAT:
+            lines.append(f"...and {len(texts) - MAX_ALERTS_PER_CHAT} more alerts")
+        messages[chat_id] = "\n".join(lines)
+    return messages
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for every provider the bot talks to. Requests arrive as
+# /<original host>/<original path> (see BOT_API_OVERRIDE in http_client) and are
+# answered from the recorded fixtures, with configurable latency, jitter,
+# injected 429s and payload sizes.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+KNOWN_COINS = [
+    ('bitcoin', 'Bitcoin', 'BTC'),
+    ('ethereum', 'Ethereum', 'ETH'),
+    ('binancecoin', 'BNB', 'BNB'),
+    ('the-open-network', 'Toncoin', 'TON'),
+    ('solana', 'Solana', 'SOL'),
+    ('dogecoin', 'Dogecoin', 'DOGE'),
+    ('pepe', 'Pepe', 'PEPE'),
+    ('floki', 'FLOKI', 'FLOKI'),
+]
+CHUNK_SIZE = 64 * 1024
+
+
+# Helper function to load a recorded fixture
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Class with the knobs of the replay server
+class ReplayConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, retry_after=1, coins=1000, ignore_filters=False):
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Random +/- seconds around the latency
+        self.error_rate = error_rate  # Fraction of requests answered with 429
+        self.retry_after = retry_after  # Seconds announced with injected 429s
+        self.coins = coins  # Size of the cryptorank currency universe
+        self.ignore_filters = ignore_filters  # Return the full currency list whatever was asked
+
+
+# Class generating provider payloads from the fixtures
+class Fixtures:
+    def __init__(self, coins):
+        self.trending = load_fixture('coingecko_trending.json')
+        self.currency = load_fixture('cryptorank_currency.json')
+        self.global_data = load_fixture('cryptorank_global.json')
+        self.weather = load_fixture('openweather_weather.json')
+        self.rates = load_fixture('exchangerate_latest.json')
+        self.currencies = [self.make_currency(index) for index in range(coins)]
+        self.full_payload = json.dumps({'data': self.currencies, 'meta': {'count': coins}}).encode()
+        self.city_names = {}
+        self.lock = threading.Lock()
+
+    # Function to build the cryptorank item of the index-th coin
+    def make_currency(self, index):
+        item = json.loads(json.dumps(self.currency))
+        if index < len(KNOWN_COINS):
+            slug, name, symbol = KNOWN_COINS[index]
+        else:
+            slug, name, symbol = f"coin-{index}", f"Coin {index}", f"C{index}"
+        item.update(id=index + 1, rank=index + 1, slug=slug, name=name, symbol=symbol)
+        item['values']['USD']['price'] = round(item['values']['USD']['price'] / (index + 1), 8)
+        return item
+
+    def price(self, coin_id):
+        return round(100000 / (zlib.crc32(coin_id.encode()) % 997 + 1), 8)
+
+    # Function to get the weather record of a city, ids are stable hashes of the name
+    def city_weather(self, name=None, city_id=None):
+        with self.lock:
+            if name is not None:
+                city_id = zlib.crc32(name.lower().encode()) % 10_000_000 + 1
+                self.city_names[city_id] = name
+            name = self.city_names.get(city_id, f"City {city_id}")
+        record = json.loads(json.dumps(self.weather))
+        record.update(id=city_id, name=name)
+        record['main']['temp'] = round(record['main']['temp'] + city_id % 20 - 10, 1)
+        record['sys']['timezone'] = record['timezone']
+        return record
+
+
+# Request handler routing /<host>/<path> to the fixture generators
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for offset in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[offset:offset + CHUNK_SIZE])
+
+    def handle_request(self):
+        # Always drain the body so an injected error keeps the connection usable
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        server = self.server
+        config = server.config
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        path = '/' + path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        route = f"{host}{path}" if not host.startswith('api.telegram.org') else f"{host}/sendMessage"
+        server.count(route)
+
+        delay = config.latency + random.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if config.error_rate and random.random() < config.error_rate:
+            server.count('429')
+            return self.send_json(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                 'parameters': {'retry_after': config.retry_after}},
+                status=429, headers={'Retry-After': str(config.retry_after)},
+            )
+
+        payload = self.route(host, path, query)
+        if payload is None:
+            return self.send_json({'error': f"no fixture for {host}{path}"}, status=404)
+        return self.send_json(payload)
+
+    def route(self, host, path, query):
+        fixtures = self.server.fixtures
+        if host == 'api.coingecko.com':
+            if path == '/api/v3/simple/price':
+                return {coin_id: {'usd': fixtures.price(coin_id)} for coin_id in query.get('ids', '').split(',') if coin_id}
+            if path == '/api/v3/search/trending':
+                return fixtures.trending
+            if path == '/api/v3/coins/markets':
+                return [
+                    {'id': coin_id, 'current_price': fixtures.price(coin_id),
+                     'market_cap': fixtures.price(coin_id) * 1e9, 'total_volume': fixtures.price(coin_id) * 1e7}
+                    for coin_id in query.get('ids', '').split(',') if coin_id
+                ]
+        elif host == 'api.cryptorank.io':
+            if path == '/v1/currencies':
+                symbols = set(filter(None, query.get('symbols', '').split(',')))
+                if not symbols or self.server.config.ignore_filters:
+                    return fixtures.full_payload
+                return {'data': [item for item in fixtures.currencies if item['symbol'] in symbols]}
+            if path == '/v2/global':
+                return fixtures.global_data
+        elif host == 'api.openweathermap.org':
+            if path == '/data/2.5/weather':
+                return fixtures.city_weather(name=query.get('q', 'Unknown'))
+            if path == '/data/2.5/group':
+                records = [fixtures.city_weather(city_id=int(city_id)) for city_id in query.get('id', '').split(',') if city_id]
+                return {'cnt': len(records), 'list': records}
+        elif host == 'api.exchangerate-api.com' and path == '/v4/latest/USD':
+            return fixtures.rates
+        elif host == 'api.telegram.org' and path.endswith('/sendMessage'):
+            message = json.loads(self.body or b'{}')
+            return {'ok': True, 'result': {'message_id': 1, 'chat': {'id': message.get('chat_id')},
+                                           'text': message.get('text', '')}}
+        return None
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+
+# HTTP server holding the config, the fixtures and request counters
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), ReplayHandler)
+        self.config = config or ReplayConfig()
+        self.fixtures = Fixtures(self.config.coins)
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+
+    def count(self, route):
+        with self.counts_lock:
+            self.counts[route] += 1
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    # Function to serve from a background thread, returns the thread
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay server for the bot's providers")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--coins', type=int, default=1000)
+    parser.add_argument('--ignore-filters', action='store_true')
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        ReplayConfig(args.latency, args.jitter, args.error_rate, coins=args.coins, ignore_filters=args.ignore_filters),
+        port=args.port,
+    )
+    print(f"Replaying providers on {server.url}, run the bot with BOT_API_OVERRIDE={server.url}")
+    server.serve_forever()
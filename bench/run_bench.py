@@ -0,0 +1,219 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from replay_server import ReplayConfig, ReplayServer
+
+# Offline benchmarks for the report: end-to-end latency of create_message,
+# per-fetcher latency, parse time and peak memory of the cryptorank payload,
+# and a load mode with many chats and cities. Everything runs against the
+# local replay server, no network access or API keys are needed.
+#
+#   python bench/run_bench.py --mode all --latency 0.05 --coins 5000 --chats 100 --cities 40
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Function to point the bot at the replay server and at throwaway state directories.
+# Must run before bot_script is imported since the modules read these at import time.
+def setup_environment(server_url, workdir, collect_metrics=False):
+    if collect_metrics:
+        os.environ['BOT_METRICS'] = '1'
+    os.environ.update({
+        'BOT_API_OVERRIDE': server_url,
+        'BOT_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'BOT_HISTORY_DIR': os.path.join(workdir, 'history'),
+        'BOT_SUBSCRIBERS': os.path.join(workdir, 'subscribers.json'),
+        'BOT_ALERTS': os.path.join(workdir, 'alerts.json'),
+        'TELEGRAM_BOT_TOKEN': 'bench-token',
+        'CRYPTO_RANK_API_KEY': 'bench-key',
+        'OPENWEATHER_API_KEY': 'bench-key',
+    })
+    sys.path.insert(0, ROOT_DIR)
+
+
+# Helper function to time a call, returns (seconds, result)
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+# Helper function to summarize timings in milliseconds
+def summarize_timings(samples):
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 2),
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        # Nearest rank, so short runs report their slowest sample instead of hiding it
+        'p95_ms': round(ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+# Function to drop the disk and in-memory caches so the next call is cold
+def clear_cache():
+    import cache
+
+    cache.cache.memory.clear()
+    shutil.rmtree(cache.cache.directory, ignore_errors=True)
+
+
+# Function to measure end-to-end report latency
+def bench_report(bot, iterations, cold):
+    samples = []
+    for _ in range(iterations):
+        if cold:
+            clear_cache()
+        seconds, message = timed(bot.create_message)
+        if not message:
+            print("Warning: create_message returned no message")
+        samples.append(seconds)
+    return summarize_timings(samples)
+
+
+# Function to measure every fetcher on its own
+def bench_fetchers(bot, iterations, cold):
+    fetchers = {
+        'fetch_crypto_prices': bot.fetch_crypto_prices,
+        'fetch_crypto_prices_cr': bot.fetch_crypto_prices_cr,
+        'fetch_market_cap_dominance_cr': bot.fetch_market_cap_dominance_cr,
+        'fetch_weather_batch': bot.fetch_weather_batch,
+        'fetch_trending_coins': bot.fetch_trending_coins,
+        'fetch_exchange_rates': bot.fetch_exchange_rates,
+    }
+    results = {}
+    for name, fetcher in fetchers.items():
+        samples = []
+        for _ in range(iterations):
+            if cold:
+                clear_cache()
+            seconds, _ = timed(fetcher)
+            samples.append(seconds)
+        results[name] = summarize_timings(samples)
+    return results
+
+
+# Function to measure parse time and peak memory of the full cryptorank payload,
+# comparing the streaming watchlist parser with loading the whole document
+def bench_parse(bot, server, iterations):
+    import http_client
+
+    def load_whole():
+        response = http_client.get("https://api.cryptorank.io/v1/currencies")
+        response.raise_for_status()
+        return {item['symbol']: item['values']['USD'] for item in response.json()['data']}
+
+    results = {}
+    server.config.ignore_filters = True
+    try:
+        for name, func in (('streaming_watchlist', lambda: bot.fetch_crypto_prices_cr(['BTC', 'ETH'])),
+                           ('whole_document', load_whole)):
+            samples = []
+            peak = 0
+            for _ in range(iterations):
+                tracemalloc.start()
+                seconds, _ = timed(func)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                samples.append(seconds)
+            results[name] = {**summarize_timings(samples), 'peak_kib': round(peak / 1024, 1)}
+    finally:
+        server.config.ignore_filters = False
+    results['payload_kib'] = round(len(server.fixtures.full_payload) / 1024, 1)
+    return results
+
+
+# Function to simulate many chats and cities
+def bench_load(bot, server, chats, cities):
+    import delivery
+
+    results = {}
+    city_names = [f"Bench City {index}" for index in range(cities)]
+    for phase in ('cold', 'warm'):
+        before = server.counts.copy()
+        seconds, weather = timed(bot.fetch_weather_batch, city_names)
+        requests_made = sum((server.counts - before).values())
+        results[f"weather_{phase}"] = {
+            'cities': len(weather), 'requests': requests_made, 'ms': round(seconds * 1000, 2),
+        }
+
+    message = bot.create_message() or "benchmark message"
+    chat_ids = [str(100000 + index) for index in range(chats)]
+    seconds, report = timed(delivery.deliver, message, chat_ids)
+    results['fan_out'] = {
+        'chats': chats, 'sent': report['sent'], 'failed': report['failed'],
+        'ms': round(seconds * 1000, 2), 'messages_per_second': round(report['sent'] / seconds, 1) if seconds else None,
+    }
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the bot")
+    parser.add_argument('--mode', choices=('all', 'report', 'fetchers', 'parse', 'load'), default='all')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--cold', action='store_true', help="clear the response cache before every run")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--coins', type=int, default=5000, help="size of the cryptorank currency list")
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument('--cities', type=int, default=40)
+    parser.add_argument('--telegram-rate', type=float, help="override the global Telegram send rate")
+    parser.add_argument('--keep-rate-limits', action='store_true', help="keep the provider token buckets")
+    parser.add_argument('--metrics', action='store_true', help="include the bot's own metrics summary in the results")
+    parser.add_argument('--json', metavar='PATH', help="also write the results to a JSON file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = ReplayServer(ReplayConfig(args.latency, args.jitter, args.error_rate, coins=args.coins))
+    server.start()
+    workdir = tempfile.mkdtemp(prefix='bot-bench-')
+    setup_environment(server.url, workdir, args.metrics)
+
+    import bot_script
+    import delivery
+    import http_client
+    import metrics
+
+    if not args.keep_rate_limits:
+        http_client.RATE_LIMITS.clear()
+    if args.telegram_rate:
+        delivery.global_limiter = delivery.RateLimiter(args.telegram_rate)
+
+    results = {'config': vars(args)}
+    try:
+        if args.mode in ('all', 'report'):
+            results['report'] = bench_report(bot_script, args.iterations, args.cold)
+        if args.mode in ('all', 'fetchers'):
+            results['fetchers'] = bench_fetchers(bot_script, args.iterations, args.cold)
+        if args.mode in ('all', 'parse'):
+            results['parse'] = bench_parse(bot_script, server, args.iterations)
+        if args.mode in ('all', 'load'):
+            results['load'] = bench_load(bot_script, server, args.chats, args.cities)
+    finally:
+        server.shutdown()
+        http_client.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results['requests'] = dict(server.counts)
+    if metrics.ENABLED:
+        results['metrics'] = metrics.summary()
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,76 @@
+import argparse
+import json
 import os
-import requests
-import telepot
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 
-# Function to fetch crypto prices from cryptorank.io
-def fetch_crypto_prices_cr():
+import http_client
+import metrics
+from alerts import ALERTS_FILE, AlertEngine, AlertRegistry, build_alert_messages, describe_rule
+from cache import cache, cached_get_json
+from delivery import SUBSCRIBERS_FILE, SubscriberRegistry, deliver, deliver_messages
+from hedging import hedged_fetch, save_latencies
+from quotes import CoinQuote, QuoteBook, iter_json_array
+from timeseries import TimeSeriesStore, percent_change
+
+# Default UTC offset of the chat, used for the greeting
+DEFAULT_UTC_OFFSET = float(os.getenv("UTC_OFFSET", "4"))
+# Default schedule of the daemon mode, in the chat's local time
+DEFAULT_REPORT_CRON = os.getenv("REPORT_CRON", "0 9,21 * * *")
+
+# Deadlines (in seconds) for the concurrent data gathering in create_message
+GLOBAL_DEADLINE = float(os.getenv("FETCH_GLOBAL_DEADLINE", "20"))
+SOURCE_DEADLINE = float(os.getenv("FETCH_SOURCE_DEADLINE", "10"))
+SOURCE_DEADLINES = {
+    'weather': 8,
+    'exchange_rates': 8,
+}
+MAX_FETCH_WORKERS = 8
+
+# Cache TTLs (in seconds) for the slow-changing sources
+CACHE_TTLS = {
+    'exchange_rates': 6 * 60 * 60,  # exchangerate-api updates once a day
+    'dominance': 15 * 60,
+    'coin_markets': 60,
+}
+
+# Coins requested from cryptorank.io, only these are downloaded and parsed
+CR_WATCHLIST = [symbol.strip() for symbol in os.getenv("CRYPTO_RANK_WATCHLIST", "BTC,ETH").split(',') if symbol.strip()]
+CR_PAGE_SIZE = 100
+CR_CHUNK_SIZE = 64 * 1024
+
+
+# Function to fetch crypto prices from cryptorank.io.
+# Only the watchlist symbols are requested (paged when the list is long) and the
+# response is parsed as a stream into a QuoteBook indexed by symbol and id.
+def fetch_crypto_prices_cr(watchlist=None):
     url = "https://api.cryptorank.io/v1/currencies"
     api_key = os.getenv("CRYPTO_RANK_API_KEY")
-    params = {
-        'api_key': api_key
-    }
+    watchlist = watchlist or CR_WATCHLIST
+    wanted = set(watchlist)
 
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()['data']
-
-        crypto_data = {}
-        for crypto in data:
-            name = crypto['name']
-            values = crypto['values']['USD']
-
-            crypto_data[name] = {
-                'Price': values['price'],
-                'Volume (24h)': values['volume24h'],
-                'High (24h)': values['high24h'],
-                'Low (24h)': values['low24h'],
-                'Market Cap': values['marketCap'],
-                'Percent Change (24h)': values['percentChange24h'],
-                'Percent Change (7d)': values['percentChange7d'],
-                'Percent Change (30d)': values['percentChange30d'],
-                'Percent Change (3m)': values['percentChange3m'],
-                'Percent Change (6m)': values['percentChange6m']
+        book = QuoteBook()
+        for offset in range(0, len(watchlist), CR_PAGE_SIZE):
+            params = {
+                'api_key': api_key,
+                'symbols': ','.join(watchlist[offset:offset + CR_PAGE_SIZE]),
+                'limit': CR_PAGE_SIZE,
             }
-
-        return crypto_data
+            response = http_client.get(url, params=params, timeout=SOURCE_DEADLINE, stream=True)
+            # Download and parsing overlap when streaming, so they are timed together
+            with response, metrics.timer('bot_http_phase_seconds', host='api.cryptorank.io', phase='transfer'):
+                response.raise_for_status()
+                chunks = metrics.count_bytes(response.iter_content(CR_CHUNK_SIZE), 'api.cryptorank.io')
+                for item in iter_json_array(chunks, 'data'):
+                    # Filter again in case the API ignores the symbols filter
+                    if item.get('symbol') in wanted:
+                        book.add(CoinQuote.from_cryptorank(item))
+
+        return book
 
     except Exception as e:
         print(f"Error fetching crypto prices: {e}")
@@ -49,9 +85,7 @@ def fetch_market_cap_dominance_cr():
     }
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()['data']
+        data = cached_get_json(url, headers=headers, ttl=CACHE_TTLS['dominance'], timeout=SOURCE_DEADLINE)['data']
 
         return {
             'BTC Dominance': data['btcDominance'],
@@ -105,132 +139,349 @@ def create_crypto_message_cr(name, details, dominance=None):
         f"\n"
     )
 
-# Function to fetch crypto prices
-def fetch_crypto_prices():
+# Coins in the price list: name -> (CoinGecko id, cryptorank symbol)
+COINS = {
+    'Bitcoin': ('bitcoin', 'BTC'),
+    'Ethereum': ('ethereum', 'ETH'),
+    'Binance Coin': ('binancecoin', 'BNB'),
+    'TON': ('the-open-network', 'TON'),
+    'Solana': ('solana', 'SOL'),
+    'Dogecoin': ('dogecoin', 'DOGE'),
+    'Pepe': ('pepe', 'PEPE'),
+    'Floki': ('floki', 'FLOKI'),
+}
+# Price providers in order of preference, the first one is the primary
+PRICE_PROVIDER_ORDER = [name.strip() for name in os.getenv("PRICE_PROVIDERS", "coingecko,cryptorank").split(',') if name.strip()]
+# Leave the hedged fetch some room before fetch_all gives up on the whole source
+PRICES_DEADLINE = 0.8 * SOURCE_DEADLINE
+
+
+# Function to fetch USD prices from CoinGecko for the given coin names
+def fetch_prices_coingecko(names):
     url = "https://api.coingecko.com/api/v3/simple/price"
+    names_by_id = {COINS[name][0]: name for name in names}
     params = {
-        'ids': 'bitcoin,ethereum,binancecoin,the-open-network,solana,dogecoin,pepe,floki',
-        'vs_currencies': 'usd',
-        'include_market_cap': 'true'  # Include market cap in the response
+        'ids': ','.join(names_by_id),
+        'vs_currencies': 'usd'
     }
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+    response = http_client.get(url, params=params, timeout=PRICES_DEADLINE)
+    response.raise_for_status()
+    data = response.json()
+    return {names_by_id[coin_id]: values.get('usd') for coin_id, values in data.items() if coin_id in names_by_id}
 
-        # Fetch Bitcoin market cap
-        btc_market_cap = data['bitcoin']['usd_market_cap']
 
-        # Fetch the total cryptocurrency market cap from a global endpoint
-        total_market_cap_url = "https://api.coingecko.com/api/v3/global"
-        total_market_cap_response = requests.get(total_market_cap_url)
-        total_market_cap_response.raise_for_status()
-        total_market_cap_data = total_market_cap_response.json()
-        total_market_cap = total_market_cap_data['data']['total_market_cap']['usd']
+# Function to fetch USD prices from cryptorank.io for the given coin names
+def fetch_prices_cryptorank(names):
+    names_by_symbol = {COINS[name][1]: name for name in names}
+    book = fetch_crypto_prices_cr(list(names_by_symbol))
+    if book is None:
+        raise RuntimeError("no data from cryptorank.io")
+    return {name: book.get(symbol).price for symbol, name in names_by_symbol.items() if symbol in book}
 
-        # Calculate Bitcoin market cap dominance
-        btc_dominance = (btc_market_cap / total_market_cap) * 100
 
-        return {
-            'Bitcoin': data['bitcoin']['usd'],
-            'Bitcoin Dominance': btc_dominance,  # Include Bitcoin dominance
-            'Ethereum': data['ethereum']['usd'],
-            'Binance Coin': data['binancecoin']['usd'],
-            'TON': data['the-open-network']['usd'],
-            'Solana': data['solana']['usd'],
-            'Dogecoin': data['dogecoin']['usd'],
-            'Pepe': f"{data['pepe']['usd']:.8f}",
-            'Floki': data['floki']['usd']
-        }
+PRICE_PROVIDERS = {
+    'coingecko': fetch_prices_coingecko,
+    'cryptorank': fetch_prices_cryptorank,
+}
+
+
+# Function to fetch crypto prices, hedged across the price providers.
+# Returns {name: {'Price': value, 'Source': provider}} for every coin any provider answered.
+def fetch_crypto_prices(coins=None):
+    names = coins or list(COINS)
+    providers = [(name, PRICE_PROVIDERS[name]) for name in PRICE_PROVIDER_ORDER]
+
+    try:
+        results = hedged_fetch(providers, names, PRICES_DEADLINE)
     except Exception as e:
         print(f"Error fetching crypto prices: {e}")
         return None
 
+    if not results:
+        return None
+    return {name: {'Price': value, 'Source': source} for name, (value, source) in results.items()}
 
-# Function to format UNIX timestamps into human-readable time
-def format_time(unix_timestamp, timezone_offset):
-    return datetime.utcfromtimestamp(unix_timestamp + timezone_offset).strftime('%H:%M %p')
 
+history = TimeSeriesStore()
 
-# Function to fetch weather data
-def fetch_weather(city):
+
+# Function to append the prices and rates of this run to the local history.
+# Coins are stored under their symbol, rates as e.g. "USD/MDL".
+def record_snapshot(prices=None, crypto_prices=None, exchange_rates=None):
+    snapshot = {}
+    for name, price in (prices or {}).items():
+        snapshot[COINS[name][1]] = price['Price']
+    # by_symbol holds the best ranked coin of each symbol, the book itself every coin
+    for symbol, quote in (crypto_prices.by_symbol.items() if crypto_prices else ()):
+        snapshot[symbol] = quote.price
+    for pair, rate in (exchange_rates or {}).items():
+        snapshot[pair.replace(' to ', '/')] = rate
+    try:
+        history.append_many(snapshot)
+    except OSError as e:
+        print(f"Error recording price history: {e}")
+    return snapshot
+
+
+# Function to get the 24h/7d changes of a coin from the local history
+def get_history_changes(symbol):
+    try:
+        with history.open(symbol) as view:
+            return {
+                '24h': percent_change(view, 24 * 60 * 60),
+                '7d': percent_change(view, 7 * 24 * 60 * 60),
+            }
+    except (OSError, ValueError) as e:
+        print(f"Error reading price history for {symbol}: {e}")
+        return {}
+
+
+ALERTS_STATE_KEY = "alerts:state"
+_alert_engine = None
+_alert_rules_mtime = None
+_alerts_lock = threading.Lock()
+
+
+# Function to get the alert engine, rebuilt only when the rules file changes
+def get_alert_engine():
+    global _alert_engine, _alert_rules_mtime
+    try:
+        mtime = os.path.getmtime(ALERTS_FILE)
+    except OSError:
+        return None  # No alerts registered
+    if _alert_engine is None or mtime != _alert_rules_mtime:
+        if _alert_engine is not None:
+            state = _alert_engine.state()
+        else:
+            entry = cache.get(ALERTS_STATE_KEY)
+            state = entry['value'] if entry else None
+        _alert_engine = AlertEngine(AlertRegistry().load(), state)
+        _alert_rules_mtime = mtime
+    return _alert_engine
+
+
+# Function to evaluate the price alerts against a snapshot and deliver the fired ones
+def check_alerts(snapshot):
+    with _alerts_lock:
+        engine = get_alert_engine()
+        if engine is None:
+            return
+
+        changes = {}
+        for symbol, window in engine.move_windows():
+            if symbol in snapshot:
+                with history.open(symbol) as view:
+                    changes[(symbol, window)] = percent_change(view, window)
+        fired = engine.evaluate(snapshot, changes)
+        cache.set(ALERTS_STATE_KEY, engine.state())
+
+    if fired:
+        deliver_messages(build_alert_messages(fired))
+
+
+# Helper function to format a USD price, keeping the digits of very small prices
+def format_price(value):
+    return f"{value:.8f}" if value < 0.01 else f"{value}"
+
+
+# Cities shown in the weather section
+WEATHER_CITIES = [city.strip() for city in os.getenv("WEATHER_CITIES", "Chisinau,Abu Dhabi").split(',') if city.strip()]
+OWM_GROUP_SIZE = 20  # Most city IDs the group endpoint accepts per call
+OWM_RESOLVE_WORKERS = 8
+# New city names looked up per report, within the OpenWeather burst (see http_client.RATE_LIMITS)
+# so the lookups do not starve the group calls; the rest are looked up by the next reports
+OWM_LOOKUPS_PER_REPORT = 10
+# Time new city names get to resolve, the rest of the weather deadline is left for the group calls
+CITY_RESOLVE_DEADLINE = 0.6 * SOURCE_DEADLINES['weather']
+
+
+# Function to format sunrise/sunset for many cities in one pass
+def format_sun_times(weather_infos):
+    epoch = datetime(1970, 1, 1)
+    for weather_info in weather_infos:
+        offset = weather_info.pop('Timezone')
+        for field in ('Sunrise', 'Sunset'):
+            weather_info[field] = (epoch + timedelta(seconds=weather_info[field] + offset)).strftime('%H:%M %p')
+    return weather_infos
+
+
+# Function to turn an OpenWeather record into weather info (sun times still raw)
+def parse_weather(city, data):
+    return {
+        'City': city,
+        'Temperature': data['main']['temp'],
+        'Feels Like': data['main']['feels_like'],
+        'Min Temp': data['main']['temp_min'],
+        'Max Temp': data['main']['temp_max'],
+        'Humidity': data['main']['humidity'],
+        'Wind Speed': data['wind']['speed'],
+        'Weather Description': data['weather'][0]['description'].capitalize(),
+        # 'Icon': data['weather'][0]['icon'],  # Weather icon code
+        'Sunrise': data['sys']['sunrise'],
+        'Sunset': data['sys']['sunset'],
+        # The group endpoint reports the offset under 'sys', the single city one at the top level
+        'Timezone': data['sys'].get('timezone', data.get('timezone', 0)),
+    }
+
+
+# Function to look up one city by name, caching its OpenWeather city ID. Returns the weather record.
+def resolve_city(city):
     api_key = os.getenv("OPENWEATHER_API_KEY")  # Securely fetching the API key
-    url = f"http://api.openweathermap.org/data/2.5/weather"
+    url = "http://api.openweathermap.org/data/2.5/weather"
     params = {
         'q': city,
         'appid': api_key,
         'units': 'metric'
     }
-
+    response = http_client.get(url, params=params, timeout=SOURCE_DEADLINE)
+    response.raise_for_status()
+    data = response.json()
+    cache.set(f"openweather:city-id:{city.lower()}", data['id'])
+    return data
+
+
+# Function to resolve city names to OpenWeather city IDs, cached persistently.
+# New names are looked up concurrently, at most OWM_LOOKUPS_PER_REPORT of them; those
+# not resolved within `deadline` seconds are left out of this report. Returns the IDs and the weather records of cities
+# resolved in this call, so a city looked up for the first time needs no second request.
+def resolve_city_ids(cities, deadline=CITY_RESOLVE_DEADLINE):
+    city_ids = {}
+    records = {}
+    unresolved = []
+    for city in cities:
+        entry = cache.get(f"openweather:city-id:{city.lower()}")
+        if entry:
+            city_ids[city] = entry['value']
+        elif city not in unresolved:
+            unresolved.append(city)
+    if not unresolved:
+        return city_ids, records
+    if len(unresolved) > OWM_LOOKUPS_PER_REPORT:
+        print(f"Looking up {', '.join(unresolved[OWM_LOOKUPS_PER_REPORT:])} in a later report")
+        unresolved = unresolved[:OWM_LOOKUPS_PER_REPORT]
+
+    executor = ThreadPoolExecutor(max_workers=min(OWM_RESOLVE_WORKERS, len(unresolved)))
+    futures = {executor.submit(resolve_city, city): city for city in unresolved}
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        weather_info = {
-            'City': city,
-            'Temperature': data['main']['temp'],
-            'Feels Like': data['main']['feels_like'],
-            'Min Temp': data['main']['temp_min'],
-            'Max Temp': data['main']['temp_max'],
-            'Humidity': data['main']['humidity'],
-            'Wind Speed': data['wind']['speed'],
-            'Weather Description': data['weather'][0]['description'].capitalize(),
-            # 'Icon': data['weather'][0]['icon'],  # Weather icon code
-            'Sunrise': format_time(data['sys']['sunrise'], data['timezone']),
-            'Sunset': format_time(data['sys']['sunset'], data['timezone'])
+        done, not_done = wait(futures, timeout=deadline)
+    finally:
+        # Lookups already sent finish in the background and are cached for the next report
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        city = futures[future]
+        try:
+            records[city] = future.result()
+            city_ids[city] = records[city]['id']
+        except Exception as e:
+            print(f"Error resolving city {city}: {e}")
+    if not_done:
+        print(f"City lookup timed out for {', '.join(futures[f] for f in not_done)}, skipping them this time")
+
+    return city_ids, records
+
+
+# Function to fetch weather for many cities through the bulk group endpoint
+def fetch_weather_batch(cities=None):
+    api_key = os.getenv("OPENWEATHER_API_KEY")  # Securely fetching the API key
+    url = "http://api.openweathermap.org/data/2.5/group"
+    cities = cities or WEATHER_CITIES
+
+    city_ids, records = resolve_city_ids(cities)
+    remaining = [city for city in cities if city in city_ids and city not in records]
+    for offset in range(0, len(remaining), OWM_GROUP_SIZE):
+        chunk = remaining[offset:offset + OWM_GROUP_SIZE]
+        cities_by_id = {}
+        for city in chunk:
+            cities_by_id.setdefault(city_ids[city], []).append(city)
+        params = {
+            'id': ','.join(str(city_id) for city_id in cities_by_id),
+            'appid': api_key,
+            'units': 'metric'
         }
-        return weather_info
-    except Exception as e:
-        print(f"Error fetching weather data for {city}: {e}")
-        return None
+        try:
+            response = http_client.get(url, params=params, timeout=SOURCE_DEADLINE)
+            response.raise_for_status()
+            for data in response.json()['list']:
+                for city in cities_by_id.get(data['id'], []):
+                    records[city] = data
+        except Exception as e:
+            print(f"Error fetching weather data for {', '.join(chunk)}: {e}")
+
+    weather_infos = []
+    for city in cities:
+        if city not in records:
+            continue
+        try:
+            weather_infos.append(parse_weather(city, records[city]))
+        except (KeyError, IndexError) as e:
+            print(f"Error parsing weather data for {city}: {e}")
+    return format_sun_times(weather_infos)
 
 
-# Function to get the most trending coin for the day
-def fetch_trending_coin():
-    url = "https://api.coingecko.com/api/v3/search/trending"
+# Function to fetch weather data
+def fetch_weather(city):
+    weather_infos = fetch_weather_batch([city])
+    return weather_infos[0] if weather_infos else None
 
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        coin = data['coins'][0]['item']  # Get the first trending coin
-
-        trending_coin = {
-            'Name': coin['name'],
-            'Symbol': coin['symbol'],
-            'Thumb': coin['thumb'],
-            'Price': f"${coin['price_btc']:.15f}",  # Assuming price is in BTC
-        }
 
-        # Fetch more details about the trending coin, like market cap and total volume
-        coin_id = coin['id']
-        coin_details_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-        coin_details_response = requests.get(coin_details_url)
-        coin_details_response.raise_for_status()
-        coin_details = coin_details_response.json()
+# Number of trending coins shown in the report
+TRENDING_COUNT = int(os.getenv("TRENDING_COUNT", "1"))
+
 
-        trending_coin['Market Cap'] = coin_details['market_data']['market_cap']['usd'] if 'market_cap' in coin_details[
-            'market_data'] else 'N/A'
-        trending_coin['Total Volume'] = coin_details['market_data']['total_volume']['usd'] if 'total_volume' in \
-                                                                                              coin_details[
-                                                                                                  'market_data'] else 'N/A'
+# Function to get the top trending coins for the day.
+# Market cap, volume and USD price for all of them come from a single
+# /coins/markets call instead of one /coins/{id} request per coin.
+def fetch_trending_coins(count=TRENDING_COUNT):
+    trending_url = "https://api.coingecko.com/api/v3/search/trending"
+    markets_url = "https://api.coingecko.com/api/v3/coins/markets"
+
+    try:
+        response = http_client.get(trending_url, timeout=SOURCE_DEADLINE)
+        response.raise_for_status()
+        items = [coin['item'] for coin in response.json()['coins'][:count]]
 
-        return trending_coin
+        ids = [item['id'] for item in items]
+        params = {
+            'vs_currency': 'usd',
+            'ids': ','.join(ids),
+            'per_page': len(ids),
+        }
+        markets = cached_get_json(markets_url, params=params, ttl=CACHE_TTLS['coin_markets'], timeout=SOURCE_DEADLINE)
+        markets_by_id = {market['id']: market for market in markets}
+
+        trending_coins = []
+        for item in items:
+            market = markets_by_id.get(item['id'], {})
+            price = market.get('current_price')
+            trending_coins.append({
+                'Name': item['name'],
+                'Symbol': item['symbol'],
+                'Thumb': item['thumb'],
+                'Price': f"${price:.10f}".rstrip('0').rstrip('.') if price is not None else 'N/A',
+                'Market Cap': market.get('market_cap') or 'N/A',
+                'Total Volume': market.get('total_volume') or 'N/A',
+            })
+
+        return trending_coins
     except Exception as e:
-        print(f"Error fetching trending coin: {e}")
+        print(f"Error fetching trending coins: {e}")
         return None
 
 
+# Function to get the most trending coin for the day
+def fetch_trending_coin():
+    trending_coins = fetch_trending_coins(1)
+    return trending_coins[0] if trending_coins else None
+
+
 # Function to fetch exchange rates
 def fetch_exchange_rates():
     url = "https://api.exchangerate-api.com/v4/latest/USD"
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = cached_get_json(url, ttl=CACHE_TTLS['exchange_rates'], timeout=SOURCE_DEADLINE)
         rates = data['rates']
         exchange_rates = {
             'USD to MDL': rates['MDL'],
@@ -245,11 +496,11 @@ def fetch_exchange_rates():
         print(f"Error fetching exchange rates: {e}")
         return None
 
-# Function to determine if it's morning or evening based on UTC+4
-def get_greeting():
-    # Get the current time in UTC and add 4 hours
+# Function to determine if it's morning or evening at the given UTC offset (UTC+4 by default)
+def get_greeting(utc_offset=DEFAULT_UTC_OFFSET):
+    # Get the current time in UTC and add the offset
     current_time_utc = datetime.utcnow()
-    adjusted_time = current_time_utc + timedelta(hours=4)
+    adjusted_time = current_time_utc + timedelta(hours=utc_offset)
 
     # Check if the adjusted time is before or after 12 PM
     if 5 <= adjusted_time.hour < 12:
@@ -258,74 +509,296 @@ def get_greeting():
         return "Добрый вечер"
 
 
-# Function to create the message content
-def create_message():
-    greeting = get_greeting()  # Get the appropriate greeting based on time
-    prices = fetch_crypto_prices()
-    crypto_prices = fetch_crypto_prices_cr()
-    dominance = fetch_market_cap_dominance_cr()
-    weather_chisinau = fetch_weather('Chisinau')
-    weather_abu_dhabi = fetch_weather('Abu Dhabi')
-    trending_coin = fetch_trending_coin()
-    exchange_rates = fetch_exchange_rates()
-
-    if prices and weather_chisinau and weather_abu_dhabi and trending_coin and exchange_rates:
-        message = (
-            f"📢\n"
-            f"{greeting}, криптанам!😎\n"  # Use the greeting here
-            f"Update на сегодня, держите краба🦀\n\n"
-            f"☂️Weather Updates:\n"
-            f"Chisinau: {weather_chisinau['Temperature']}°C, {weather_chisinau['Weather Description']}\n"
-            f"  💁🏻‍♂️Feels like: {weather_chisinau['Feels Like']}°C\n"
-            f"  ⬇️Min Temp: {weather_chisinau['Min Temp']}°C, ⬆️Max Temp: {weather_chisinau['Max Temp']}°C\n"
-            f"  🌅Sunrise: {weather_chisinau['Sunrise']}, 🌇Sunset: {weather_chisinau['Sunset']}\n\n"
-            f"Abu Dhabi: {weather_abu_dhabi['Temperature']}°C, {weather_abu_dhabi['Weather Description']}\n"
-            f"  💁🏻‍♂️Feels like: {weather_abu_dhabi['Feels Like']}°C\n"
-            f"  ⬇️Min Temp: {weather_abu_dhabi['Min Temp']}°C, ⬆️Max Temp: {weather_abu_dhabi['Max Temp']}°C\n"
-            f"  🌅Sunrise: {weather_abu_dhabi['Sunrise']}, 🌇Sunset: {weather_abu_dhabi['Sunset']}\n\n"
-            f"🐸Crypto Prices Update:\n"
-            f"{create_crypto_message_cr("Bitcoin", crypto_prices['Bitcoin'], dominance['BTC Dominance'])}"
-            f"{create_crypto_message_cr("Ethereum", crypto_prices['Ethereum'], dominance['ETH Dominance'])}"
-            f"🪙Binance Coin: ${prices['Binance Coin']}\n"
-            f"🪙TON: ${prices['TON']}\n"
-            f"🪙Solana: ${prices['Solana']}\n"
-            f"🪙Dogecoin: ${prices['Dogecoin']}\n"
-            f"🪙Pepe: ${prices['Pepe']}\n"
-            f"🪙Floki: ${prices['Floki']}\n\n"
-            f"📈🪙Trending Coin for Today:\n"
+# Function to run several fetchers concurrently with a global and per-source deadline.
+# `sources` maps a name to a (function, args) pair; sources that fail or miss their
+# deadline are reported as None so the caller can drop the matching section.
+def fetch_all(sources, deadlines=None, global_deadline=GLOBAL_DEADLINE):
+    deadlines = deadlines or {}
+    start = time.monotonic()
+    results = {name: None for name in sources}
+    if not sources:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(sources)))
+    futures = {}
+    for name, (func, args) in sources.items():
+        deadline = min(deadlines.get(name, SOURCE_DEADLINE), global_deadline)
+        if metrics.ENABLED:
+            future = executor.submit(metrics.timed_call, name, func, *args)
+        else:
+            future = executor.submit(func, *args)
+        futures[future] = (name, start + deadline)
+
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if futures[f][1] <= now]:
+                pending.discard(future)
+                metrics.increment('bot_source_failures_total', source=futures[future][0], reason='deadline')
+                print(f"Deadline exceeded for {futures[future][0]}, skipping it")
+            if not pending:
+                break
+
+            next_deadline = min(futures[f][1] for f in pending)
+            done, pending = wait(pending, timeout=next_deadline - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future][0]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error fetching {name}: {e}")
+    finally:
+        # Do not block on stragglers, their requests time out on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+# Function to create the weather lines for a single city
+def create_weather_message(weather):
+    return (
+        f"{weather['City']}: {weather['Temperature']}°C, {weather['Weather Description']}\n"
+        f"  💁🏻‍♂️Feels like: {weather['Feels Like']}°C\n"
+        f"  ⬇️Min Temp: {weather['Min Temp']}°C, ⬆️Max Temp: {weather['Max Temp']}°C\n"
+        f"  🌅Sunrise: {weather['Sunrise']}, 🌇Sunset: {weather['Sunset']}\n\n"
+    )
+
+
+# Function to create the crypto prices section.
+# Coins with a detailed cryptorank block are not repeated in the short price list.
+def create_prices_message(prices, crypto_prices, dominance):
+    dominance = dominance or {}
+    message = "🐸Crypto Prices Update:\n"
+    detailed = set()
+    if crypto_prices:
+        for symbol, name in (('BTC', 'Bitcoin'), ('ETH', 'Ethereum')):
+            if symbol in crypto_prices:
+                message += create_crypto_message_cr(name, crypto_prices.get(symbol), dominance.get(f"{symbol} Dominance"))
+                detailed.add(name)
+    if prices:
+        for name in COINS:
+            if name in prices and name not in detailed:
+                changes = ''.join(
+                    f" {get_trend_emoji(change)}{change:+.2f}% ({period})"
+                    for period, change in get_history_changes(COINS[name][1]).items() if change is not None
+                )
+                message += f"🪙{name}: ${format_price(prices[name]['Price'])}{changes}\n"
+    return message + "\n"
+
+
+# Function to create the trending coins section
+def create_trending_message(trending_coins):
+    title = "Trending Coin for Today" if len(trending_coins) == 1 else "Trending Coins for Today"
+    message = f"📈🪙{title}:\n"
+    for trending_coin in trending_coins:
+        message += (
             f"Name: {trending_coin['Name']}\n"
             f"Symbol: {trending_coin['Symbol']}\n"
             f"Price: {trending_coin['Price']}\n"
             f"Market Cap: ${trending_coin['Market Cap']}\n"
             f"Total Volume: ${trending_coin['Total Volume']}\n"
             f"Thumbnail: {trending_coin['Thumb']}\n\n"
-            f"💸Exchange Rates:\n"
-            f"💵Exchange Rate for 1 USD:\n"
-            f"MDL: {exchange_rates['USD to MDL']:.2f}\n"
-            f"💶Exchange Rate for 1 EURO:\n"
-            f"MDL: {exchange_rates['EUR to MDL']:.2f}\n"
-            f"Exchange Rate for 1 USD (Other Currencies):\n"
-            f"AED: {exchange_rates['USD to AED']:.2f}\n"
-            f"RON: {exchange_rates['USD to RON']:.2f}\n"
-            f"RUB: {exchange_rates['USD to RUB']:.2f}\n"
-            f"UAH: {exchange_rates['USD to UAH']:.2f}\n"
         )
-        return message
-    return None
+    return message
 
 
-# Function to send message via Telegram
-def send_message_via_telegram(message):
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")  # Securely fetching the bot token
-    chat_id = os.getenv("CHAT_ID")  # Securely fetching the chat ID
-    bot = telepot.Bot(bot_token)
-    bot.sendMessage(chat_id, message)
+# Function to create the exchange rates section
+def create_exchange_message(exchange_rates):
+    return (
+        f"💸Exchange Rates:\n"
+        f"💵Exchange Rate for 1 USD:\n"
+        f"MDL: {exchange_rates['USD to MDL']:.2f}\n"
+        f"💶Exchange Rate for 1 EURO:\n"
+        f"MDL: {exchange_rates['EUR to MDL']:.2f}\n"
+        f"Exchange Rate for 1 USD (Other Currencies):\n"
+        f"AED: {exchange_rates['USD to AED']:.2f}\n"
+        f"RON: {exchange_rates['USD to RON']:.2f}\n"
+        f"RUB: {exchange_rates['USD to RUB']:.2f}\n"
+        f"UAH: {exchange_rates['USD to UAH']:.2f}\n"
+    )
 
 
-if __name__ == "__main__":
-    message = create_message()
+# Function to create the message content.
+# All sources are fetched concurrently; a section is left out when its source
+# failed or missed its deadline instead of failing the whole message.
+def create_message(utc_offset=DEFAULT_UTC_OFFSET):
+    greeting = get_greeting(utc_offset)  # Get the appropriate greeting based on time
+    data = fetch_all({
+        'prices': (fetch_crypto_prices, ()),
+        'crypto_prices': (fetch_crypto_prices_cr, ()),
+        'dominance': (fetch_market_cap_dominance_cr, ()),
+        'weather': (fetch_weather_batch, ()),
+        'trending_coins': (fetch_trending_coins, ()),
+        'exchange_rates': (fetch_exchange_rates, ()),
+    }, SOURCE_DEADLINES)
+
+    snapshot = record_snapshot(data['prices'], data['crypto_prices'], data['exchange_rates'])
+    try:
+        check_alerts(snapshot)
+    except Exception as e:
+        print(f"Error checking price alerts: {e}")
+
+    sections = []
+    if data['weather']:
+        sections.append("☂️Weather Updates:\n" + "".join(create_weather_message(w) for w in data['weather']))
+    if data['prices'] or data['crypto_prices']:
+        sections.append(create_prices_message(data['prices'], data['crypto_prices'], data['dominance']))
+    if data['trending_coins']:
+        sections.append(create_trending_message(data['trending_coins']))
+    if data['exchange_rates']:
+        sections.append(create_exchange_message(data['exchange_rates']))
+
+    if not sections:
+        return None
+
+    header = (
+        f"📢\n"
+        f"{greeting}, криптанам!😎\n"  # Use the greeting here
+        f"Update на сегодня, держите краба🦀\n\n"
+    )
+    return header + "".join(sections)
+
+
+# Function to send message via Telegram to one chat (CHAT_ID by default)
+def send_message_via_telegram(message, chat_id=None):
+    chat_id = chat_id or os.getenv("CHAT_ID")  # Securely fetching the chat ID
+    return deliver(message, [chat_id])
+
+
+# Function to list every chat that gets the report: CHAT_ID plus the subscriber registry
+def get_report_chats():
+    chats = SubscriberRegistry().load()
+    if os.getenv("CHAT_ID"):
+        chats.setdefault(os.getenv("CHAT_ID"), {})
+    return chats
+
+
+# Function to load the daemon schedule as a list of {chat_ids, cron/interval, utc_offset}.
+# BOT_SCHEDULE points to a JSON list such as
+# [{"chat_id": "123", "cron": "0 9,21 * * *", "utc_offset": 4}, {"chat_id": "456", "interval": 3600}]
+# otherwise subscribers are used with their own settings, REPORT_CRON by default.
+# Chats sharing a schedule and offset get a single report fanned out to all of them.
+def load_schedule():
+    path = os.getenv("BOT_SCHEDULE")
+    if path:
+        with open(path, encoding='utf-8') as f:
+            entries = {str(entry['chat_id']): entry for entry in json.load(f)}
+    else:
+        entries = get_report_chats()
+
+    groups = {}
+    for chat_id, settings in entries.items():
+        interval = settings.get('interval')
+        key = (
+            None if interval else settings.get('cron', DEFAULT_REPORT_CRON),
+            interval,
+            settings.get('utc_offset', DEFAULT_UTC_OFFSET),
+        )
+        groups.setdefault(key, []).append(chat_id)
+    return [
+        {'chat_ids': chat_ids, 'cron': cron, 'interval': interval, 'utc_offset': utc_offset}
+        for (cron, interval, utc_offset), chat_ids in groups.items()
+    ]
+
+
+# Function to build one report and deliver it to the given chats
+def send_report(chat_ids, utc_offset=DEFAULT_UTC_OFFSET):
+    message = create_message(utc_offset)
     if message:
-        send_message_via_telegram(message)
-        print("Message sent successfully!")
+        deliver(message, chat_ids)
+    else:
+        print(f"Failed to fetch data or create the message for {', '.join(chat_ids)}.")
+
+
+# Function to run the bot as a long-running service.
+# Connections, caches and latency samples stay warm between scheduled reports.
+# The schedule is reloaded when BOT_SCHEDULE or the subscriber registry changes,
+# so chats added with --subscribe get their reports without a restart.
+def run_daemon():
+    from scheduler import Job, Scheduler
+
+    schedule_path = os.getenv("BOT_SCHEDULE") or SUBSCRIBERS_FILE
+    loaded_mtime = -1.0  # Not loaded yet
+
+    def reload_jobs():
+        nonlocal loaded_mtime
+        try:
+            mtime = os.path.getmtime(schedule_path)
+        except OSError:
+            mtime = None  # No subscribers yet
+        if mtime == loaded_mtime:
+            return None
+        jobs = [
+            Job(
+                f"report for {', '.join(entry['chat_ids'])}",
+                lambda chat_ids=entry['chat_ids'], utc_offset=entry['utc_offset']: send_report(chat_ids, utc_offset),
+                cron=entry['cron'],
+                interval=entry['interval'],
+                utc_offset=entry['utc_offset'],
+            )
+            for entry in load_schedule()
+        ]
+        loaded_mtime = mtime
+        return jobs
+
+    scheduler = Scheduler(reload=reload_jobs)
+    scheduler.add_shutdown_hook(save_latencies)
+    scheduler.add_shutdown_hook(http_client.close)
+    if metrics.ENABLED and metrics.METRICS_PORT:
+        scheduler.add_shutdown_hook(metrics.start_server().shutdown)
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run()
+    print("Daemon stopped.")
+
+
+# Function to parse the command line
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crypto and weather Telegram bot")
+    parser.add_argument('--daemon', action='store_true', help="run as a service with the in-process scheduler")
+    parser.add_argument('--subscribe', metavar='CHAT_ID', help="add a chat to the subscriber registry")
+    parser.add_argument('--unsubscribe', metavar='CHAT_ID', help="remove a chat from the subscriber registry")
+    parser.add_argument('--utc-offset', type=float, help="UTC offset of the subscribed chat")
+    parser.add_argument('--cron', help="report schedule of the subscribed chat")
+    parser.add_argument('--add-alert', metavar='RULE', help='add a price alert, e.g. "BTC crosses 70k" or "PEPE ±10%% in 1h"')
+    parser.add_argument('--chat', metavar='CHAT_ID', help="chat that receives the alert (CHAT_ID by default)")
+    parser.add_argument('--remove-alert', metavar='ID', type=int, help="remove a price alert")
+    parser.add_argument('--list-alerts', action='store_true', help="list the registered price alerts")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.subscribe:
+        settings = {'utc_offset': args.utc_offset, 'cron': args.cron}
+        SubscriberRegistry().add(args.subscribe, **{k: v for k, v in settings.items() if v is not None})
+        print(f"Subscribed {args.subscribe}.")
+    elif args.unsubscribe:
+        SubscriberRegistry().remove(args.unsubscribe)
+        print(f"Unsubscribed {args.unsubscribe}.")
+    elif args.add_alert:
+        rule = AlertRegistry().add(args.chat or os.getenv("CHAT_ID"), args.add_alert)
+        print(f"Added alert {rule['id']}: {describe_rule(rule)}.")
+    elif args.remove_alert is not None:
+        if AlertRegistry().remove(args.remove_alert):
+            print(f"Removed alert {args.remove_alert}.")
+        else:
+            print(f"No alert {args.remove_alert}.")
+    elif args.list_alerts:
+        for rule in AlertRegistry().load():
+            print(f"{rule['id']}: {describe_rule(rule)} -> {rule['chat_id']}")
+    elif args.daemon:
+        run_daemon()
     else:
-        print("Failed to fetch data or create the message.")
+        message = create_message()
+        if message:
+            report = deliver(message, list(get_report_chats()))
+            if report['sent']:
+                print("Message sent successfully!")
+        else:
+            print("Failed to fetch data or create the message.")
+        summary_path = metrics.write_summary()
+        if summary_path:
+            print(f"Metrics written to {summary_path}")
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import http_client
+import metrics
+
+# Persistent response cache in front of the fetchers: one JSON file per entry,
+# a TTL per source, LRU eviction bounded by entry count and total size,
+# ETag/If-Modified-Since revalidation and stale serving when a provider is down.
+
+CACHE_DIR = os.getenv("BOT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+MAX_ENTRIES = 256
+MAX_BYTES = 16 * 1024 * 1024
+STALE_GRACE = 24 * 60 * 60  # How long past its TTL an entry may be served if the provider fails
+
+
+# Class to store JSON values on disk, least recently used entries are evicted first.
+# Entries read or written are also kept in memory, so a long-running process stays warm.
+class DiskCache:
+    def __init__(self, directory=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    # Function to read an entry, None when it is missing or unreadable
+    def get(self, key):
+        path = self._path(key)
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+        try:
+            if entry is None:
+                with open(path, encoding='utf-8') as f:
+                    entry = json.load(f)
+                if entry.get('key') != key:
+                    return None
+                self._remember(key, entry)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            return entry
+        return entry
+
+    # Function to write an entry; ttl=None means it never expires
+    def set(self, key, value, ttl=None, etag=None, last_modified=None):
+        entry = {
+            'key': key,
+            'stored_at': time.time(),
+            'ttl': ttl,
+            'etag': etag,
+            'last_modified': last_modified,
+            'value': value,
+        }
+        self._remember(key, entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+            self.evict()
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {e}")
+        return entry
+
+    # Function to drop least recently used entries until the cache fits its bounds
+    def evict(self):
+        with self.lock:
+            files = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            while files and (len(files) > self.max_entries or total > self.max_bytes):
+                _, size, name = files.pop(0)
+                total -= size
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+cache = DiskCache()
+
+
+# Helper function to check if an entry is still within its TTL
+def is_fresh(entry, now=None):
+    if entry['ttl'] is None:
+        return True
+    return (now or time.time()) - entry['stored_at'] < entry['ttl']
+
+
+# Helper function to check if an expired entry may still be served after a failure
+def is_within_grace(entry, stale_grace, now=None):
+    if entry['ttl'] is None:
+        return True
+    return (now or time.time()) - entry['stored_at'] < entry['ttl'] + stale_grace
+
+
+# Helper function to build a cache key from a URL and its query parameters
+def make_key(url, params=None):
+    if not params:
+        return url
+    return url + '?' + '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+
+# Function to GET a JSON document through the cache.
+# Fresh entries are served without a request, expired ones are revalidated with
+# ETag/Last-Modified, and stale ones are served for `stale_grace` seconds if the request fails.
+def cached_get_json(url, params=None, headers=None, ttl=None, stale_grace=STALE_GRACE, **kwargs):
+    key = make_key(url, params)
+    host = urlsplit(url).hostname
+    entry = cache.get(key)
+    if entry and is_fresh(entry):
+        metrics.increment('bot_cache_requests_total', host=host, result='hit')
+        return entry['value']
+
+    headers = dict(headers or {})
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = http_client.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry:
+            metrics.increment('bot_cache_requests_total', host=host, result='revalidated')
+            cache.set(key, entry['value'], ttl, entry.get('etag'), entry.get('last_modified'))
+            return entry['value']
+        response.raise_for_status()
+        value = response.json()
+    except Exception as e:
+        if entry and is_within_grace(entry, stale_grace):
+            print(f"Serving stale cache for {url}: {e}")
+            metrics.increment('bot_cache_requests_total', host=host, result='stale')
+            return entry['value']
+        raise
+
+    metrics.increment('bot_cache_requests_total', host=host, result='miss')
+    cache.set(key, value, ttl, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return value
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import http_client
+import metrics
+
+# Fan-out delivery of a report to many Telegram chats: a persistent subscriber
+# registry, an asyncio send queue that respects Telegram's global and per-chat
+# rate limits, retries on 429 with the returned retry_after, splitting of long
+# messages and a delivery report.
+
+SUBSCRIBERS_FILE = os.getenv(
+    "BOT_SUBSCRIBERS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "subscribers.json")
+)
+TELEGRAM_API_URL = "https://api.telegram.org"
+TELEGRAM_HOST = urlsplit(TELEGRAM_API_URL).hostname
+MESSAGE_LIMIT = 4096  # Telegram counts UTF-16 code units
+GLOBAL_RATE = 30  # Messages per second across all chats
+PRIVATE_CHAT_INTERVAL = 1.0  # Seconds between messages to the same private chat
+GROUP_CHAT_INTERVAL = 3.0  # Groups are limited to 20 messages per minute
+SEND_WORKERS = 16
+MAX_ATTEMPTS = 5
+SEND_TIMEOUT = 10
+
+
+# Class to keep the subscribed chats in a JSON file
+class SubscriberRegistry:
+    def __init__(self, path=SUBSCRIBERS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, chats):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(chats, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # Function to add or update a chat, extra fields (e.g. utc_offset) are stored with it
+    def add(self, chat_id, **settings):
+        with self.lock:
+            chats = self.load()
+            chats[str(chat_id)] = {**chats.get(str(chat_id), {}), **settings}
+            self._save(chats)
+
+    def remove(self, chat_id):
+        with self.lock:
+            chats = self.load()
+            if chats.pop(str(chat_id), None) is not None:
+                self._save(chats)
+
+
+# Helper function to measure text the way Telegram does
+def telegram_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+# Function to split a message into parts within Telegram's limit, preferring line breaks
+def split_message(text, limit=MESSAGE_LIMIT):
+    parts = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        while telegram_length(line) > limit:
+            # A single line longer than the limit is cut hard
+            cut = limit
+            while telegram_length(line[:cut]) > limit:
+                cut -= 1
+            if current:
+                parts.append(current)
+                current = ''
+            parts.append(line[:cut])
+            line = line[cut:]
+        if telegram_length(current) + telegram_length(line) > limit:
+            parts.append(current)
+            current = ''
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+
+# Rate limiter spacing sends `1 / rate` seconds apart. Thread-safe, so every
+# delivery of the process (each with its own event loop) shares the same budget.
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    # Function to book the next slot, returns how long to wait for it
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        return max(0.0, wait_time)
+
+    async def acquire(self):
+        wait_time = self.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+# Class to track when each chat may get its next message, shared by every delivery of the process
+class ChatSlots:
+    MAX_CHATS = 10000  # Expired entries are dropped beyond this
+
+    def __init__(self):
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    # Function to claim a chat for sending, returns 0 or how long until it is free
+    def claim(self, chat_id, interval):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_allowed.get(chat_id, 0.0) - now
+            if wait_time > 0:
+                return wait_time
+            if len(self.next_allowed) >= self.MAX_CHATS:
+                self.next_allowed = {chat: at for chat, at in self.next_allowed.items() if at > now}
+            self.next_allowed[chat_id] = now + interval
+            return 0.0
+
+    # Function to keep a chat busy until `until` (time.monotonic() based)
+    def defer(self, chat_id, until):
+        with self.lock:
+            self.next_allowed[chat_id] = max(self.next_allowed.get(chat_id, 0.0), until)
+
+
+# Telegram's limits apply to the bot as a whole, so they are kept per process
+global_limiter = RateLimiter(GLOBAL_RATE)
+chat_slots = ChatSlots()
+
+
+# Class describing the delivery of one message to one chat
+class Delivery:
+    __slots__ = ('chat_id', 'parts', 'sent', 'attempts', 'failures', 'error')
+
+    def __init__(self, chat_id, parts):
+        self.chat_id = str(chat_id)
+        self.parts = parts
+        self.sent = 0
+        self.attempts = 0
+        self.failures = 0  # Consecutive failures of the current part
+        self.error = None
+
+    @property
+    def done(self):
+        return self.sent == len(self.parts) or self.error is not None
+
+
+# Function to send one message part, returns (status code, retry_after, error)
+def send_part(bot_token, chat_id, text):
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/sendMessage"
+    response = http_client.post(url, json={'chat_id': chat_id, 'text': text}, timeout=SEND_TIMEOUT, max_retries=0)
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    metrics.increment('bot_telegram_sends_total', status=str(response.status_code))
+    if response.status_code == 200 and data.get('ok'):
+        return 200, None, None
+    retry_after = (data.get('parameters') or {}).get('retry_after')
+    if response.status_code == 429 and retry_after is None:
+        retry_after = http_client.parse_retry_after(response.headers.get('Retry-After')) or 1
+    return response.status_code, retry_after, data.get('description') or f"HTTP {response.status_code}"
+
+
+# Coroutine to deliver `messages` ({chat_id: text}); returns the delivery report
+async def deliver_async(messages, bot_token):
+    split_cache = {}
+    deliveries = []
+    for chat_id, text in messages.items():
+        if text not in split_cache:
+            split_cache[text] = split_message(text)
+        if split_cache[text]:
+            deliveries.append(Delivery(chat_id, split_cache[text]))
+    if not deliveries:
+        return build_report(deliveries, 0.0)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    remaining = len(deliveries)
+    finished = asyncio.Event()
+    start = time.monotonic()
+
+    def requeue(delivery, delay):
+        loop.call_later(max(0.0, delay), queue.put_nowait, delivery)
+
+    def finish(delivery):
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0:
+            finished.set()
+
+    async def worker():
+        while True:
+            delivery = await queue.get()
+            # Respect the per-chat limit without holding the worker
+            interval = GROUP_CHAT_INTERVAL if delivery.chat_id.startswith('-') else PRIVATE_CHAT_INTERVAL
+            wait_time = chat_slots.claim(delivery.chat_id, interval)
+            if wait_time > 0:
+                requeue(delivery, wait_time)
+                continue
+
+            await global_limiter.acquire()
+            # Count the interval from the actual send
+            chat_slots.defer(delivery.chat_id, time.monotonic() + interval)
+            delivery.attempts += 1
+            try:
+                status, retry_after, error = await asyncio.to_thread(
+                    send_part, bot_token, delivery.chat_id, delivery.parts[delivery.sent]
+                )
+            except Exception as e:
+                # The message would contain the request URL, and with it the bot token
+                status, retry_after, error = None, None, f"{type(e).__name__} sending to {TELEGRAM_HOST}"
+
+            if status == 200:
+                delivery.sent += 1
+                delivery.failures = 0
+                if delivery.done:
+                    finish(delivery)
+                else:
+                    requeue(delivery, interval)
+                continue
+
+            delivery.failures += 1
+            if retry_after is not None and delivery.failures < MAX_ATTEMPTS:
+                chat_slots.defer(delivery.chat_id, time.monotonic() + retry_after)
+                requeue(delivery, retry_after)
+            elif delivery.failures < MAX_ATTEMPTS and (status is None or status >= 500):
+                requeue(delivery, http_client.backoff_delay(delivery.failures))
+            else:
+                delivery.error = error
+                finish(delivery)
+
+    for delivery in deliveries:
+        queue.put_nowait(delivery)
+    workers = [asyncio.create_task(worker()) for _ in range(min(SEND_WORKERS, len(deliveries)))]
+    try:
+        await finished.wait()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return build_report(deliveries, time.monotonic() - start)
+
+
+# Function to summarize deliveries into a report
+def build_report(deliveries, elapsed):
+    chats = {
+        delivery.chat_id: {
+            'status': 'sent' if delivery.error is None and delivery.done else 'failed',
+            'parts': delivery.sent,
+            'attempts': delivery.attempts,
+            'error': delivery.error,
+        }
+        for delivery in deliveries
+    }
+    return {
+        'sent': sum(1 for chat in chats.values() if chat['status'] == 'sent'),
+        'failed': sum(1 for chat in chats.values() if chat['status'] == 'failed'),
+        'elapsed': round(elapsed, 3),
+        'chats': chats,
+    }
+
+
+# Function to deliver a different message per chat ({chat_id: text}) from synchronous code
+def deliver_messages(messages, bot_token=None):
+    bot_token = bot_token or os.getenv("TELEGRAM_BOT_TOKEN")  # Securely fetching the bot token
+    messages = {str(chat_id): text for chat_id, text in messages.items()}
+    report = asyncio.run(deliver_async(messages, bot_token))
+    print(f"Delivered to {report['sent']} chat(s), {report['failed']} failed, in {report['elapsed']}s")
+    for chat_id, chat in report['chats'].items():
+        if chat['status'] == 'failed':
+            print(f"Error delivering to {chat_id}: {chat['error']}")
+    return report
+
+
+# Function to deliver the same `message` to many chats from synchronous code
+def deliver(message, chat_ids, bot_token=None):
+    return deliver_messages({chat_id: message for chat_id in chat_ids}, bot_token)
@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+from cache import cache
+
+# Hedged requests across several providers: the next provider is fired when the
+# previous one has not answered within its p95 latency, and the answers are
+# merged key by key, remembering which provider supplied each value.
+
+DEFAULT_HEDGE_DELAY = 1.5  # Used until a provider has enough latency samples
+MIN_SAMPLES = 5
+LATENCY_WINDOW = 50
+LATENCY_CACHE_KEY = "hedging:latency"
+
+
+# Class to keep a rolling window of a provider's latencies
+class LatencyTracker:
+    def __init__(self, samples=None):
+        self.samples = list(samples or [])[-LATENCY_WINDOW:]
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            del self.samples[:-LATENCY_WINDOW]
+
+    # Function to estimate the 95th percentile latency (nearest rank)
+    def p95(self):
+        with self.lock:
+            if len(self.samples) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+_trackers = None
+_trackers_lock = threading.Lock()
+
+
+# Function to get the tracker of a provider, loading past samples from the cache once
+def get_tracker(name):
+    global _trackers
+    with _trackers_lock:
+        if _trackers is None:
+            entry = cache.get(LATENCY_CACHE_KEY)
+            _trackers = {
+                provider: LatencyTracker(samples)
+                for provider, samples in (entry['value'] if entry else {}).items()
+            }
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+# Function to persist latency samples so one-shot runs start with real p95 values
+def save_latencies():
+    with _trackers_lock:
+        if _trackers:
+            cache.set(LATENCY_CACHE_KEY, {name: list(tracker.samples) for name, tracker in _trackers.items()})
+
+
+# Function to fetch `keys` from `providers`, a list of (name, function) pairs in order
+# of preference. Each function takes the list of keys still missing and returns a dict
+# with the values it has. Returns {key: (value, provider name)} for the keys found
+# before `deadline` seconds.
+def hedged_fetch(providers, keys, deadline):
+    start = time.monotonic()
+    deadline_at = start + deadline
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(providers)))
+    futures = {}
+    next_index = 0
+    hedge_at = start
+
+    def launch():
+        nonlocal next_index, hedge_at
+        name, func = providers[next_index]
+        next_index += 1
+        tracker = get_tracker(name)
+        launched_at = time.monotonic()
+        missing = [key for key in keys if key not in results]
+        future = executor.submit(func, missing)
+
+        # Record every answer, even the ones we stopped waiting for. Failures are left
+        # out of the tracker, fast errors would pull the hedge delay down.
+        def record(done):
+            if done.cancelled():
+                return
+            seconds = time.monotonic() - launched_at
+            metrics.observe('bot_provider_seconds', seconds, provider=name)
+            if done.exception() is None:
+                tracker.record(seconds)
+
+        future.add_done_callback(record)
+        futures[future] = name
+        hedge_at = launched_at + tracker.p95()
+        return future
+
+    try:
+        pending = set()
+        while len(results) < len(keys):
+            now = time.monotonic()
+            if now >= deadline_at:
+                print(f"Deadline exceeded, missing {', '.join(k for k in keys if k not in results)}")
+                break
+            if next_index < len(providers) and (not pending or now >= hedge_at):
+                pending.add(launch())
+                continue
+            if not pending:
+                break
+
+            wake_at = min(hedge_at, deadline_at) if next_index < len(providers) else deadline_at
+            done, pending = wait(pending, timeout=max(0, wake_at - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    values = future.result() or {}
+                except Exception as e:
+                    print(f"Error fetching from {name}: {e}")
+                    # Fire the next provider right away instead of waiting for the hedge delay
+                    hedge_at = time.monotonic()
+                    continue
+                for key, value in values.items():
+                    if key in keys and key not in results and value is not None:
+                        results[key] = (value, name)
+                if any(key not in results for key in keys):
+                    hedge_at = time.monotonic()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        save_latencies()
+
+    return results
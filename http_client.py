@@ -0,0 +1,182 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import metrics
+
+# Shared HTTP client used by every fetcher: one pooled keep-alive session,
+# a token bucket per provider host and retries on 429/5xx with jittered backoff.
+# `requests` is imported on first use to keep startup light.
+
+DEFAULT_TIMEOUT = 10
+POOL_CONNECTIONS = 8  # Number of hosts kept in the pool
+POOL_MAXSIZE = 8  # Connections kept alive per host
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8  # Longest we are willing to sleep before a retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Send every request to this base URL instead, with the original host as the first
+# path segment (e.g. http://127.0.0.1:8765/api.coingecko.com/api/v3/...). Used by the benchmarks.
+API_OVERRIDE = os.getenv("BOT_API_OVERRIDE")
+
+# Sustained requests per second and burst size for each provider host
+RATE_LIMITS = {
+    'api.coingecko.com': (0.5, 5),  # Free tier allows about 30 calls per minute
+    'api.cryptorank.io': (1, 5),
+    'api.openweathermap.org': (1, 10),  # Free tier allows 60 calls per minute
+    'api.exchangerate-api.com': (1, 5),
+}
+
+_session = None
+_session_lock = threading.Lock()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+# Token bucket used to stay below a provider's rate limit
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available and take it
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# Function to get (or lazily create) the shared session
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            metrics.instrument_adapter(adapter)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+# Function to close the shared session and drop pooled connections
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# Function to get the token bucket for a host, None if the host is not limited
+def get_bucket(host):
+    if host not in RATE_LIMITS:
+        return None
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(*RATE_LIMITS[host])
+        return _buckets[host]
+
+
+# Helper function to read the Retry-After header (seconds or HTTP date)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Helper function to compute a full-jitter exponential backoff delay
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# Helper function to apply API_OVERRIDE to a URL
+def rewrite_url(url):
+    if not API_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    rewritten = f"{API_OVERRIDE.rstrip('/')}/{parts.netloc}{parts.path}"
+    return f"{rewritten}?{parts.query}" if parts.query else rewritten
+
+
+# Function to send a request through the shared session with rate limiting and retries.
+# The last response is returned as is, callers still call raise_for_status().
+def request(method, url, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES, **kwargs):
+    import requests
+
+    host = urlsplit(url).hostname
+    bucket = get_bucket(host)
+    session = get_session()
+    url = rewrite_url(url)
+
+    for attempt in range(max_retries + 1):
+        if bucket:
+            with metrics.timer('bot_http_phase_seconds', host=host, phase='rate_limit_wait'):
+                bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.increment('bot_http_errors_total', host=host, error=type(e).__name__)
+            if attempt == max_retries:
+                raise
+            metrics.increment('bot_http_retries_total', host=host, reason='error')
+            time.sleep(backoff_delay(attempt))
+            continue
+        if metrics.ENABLED:
+            metrics.record_response(host, response, time.perf_counter() - start, kwargs.get('stream', False))
+
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return response
+
+        delay = parse_retry_after(response.headers.get('Retry-After'))
+        if delay is None:
+            delay = backoff_delay(attempt)
+        elif delay > BACKOFF_MAX:
+            # The provider wants us gone for longer than a report can wait
+            return response
+        else:
+            delay += random.uniform(0, BACKOFF_BASE)
+        metrics.increment('bot_http_retries_total', host=host, reason=str(response.status_code))
+        response.close()
+        time.sleep(delay)
+
+    return response
+
+
+# Function to send a GET request through the shared client
+def get(url, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+
+# Function to send a POST request through the shared client
+def post(url, data=None, json=None, **kwargs):
+    return request('POST', url, data=data, json=json, **kwargs)
@@ -0,0 +1,378 @@
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+# Built-in instrumentation: histograms and counters for every fetcher, every HTTP
+# request (per phase: DNS, connect, TLS, headers, transfer, parse) and the Telegram
+# send. Exposed as Prometheus text in daemon mode and written as a JSON summary
+# after one-shot runs. When disabled every entry point returns right away.
+
+ENABLED = os.getenv("BOT_METRICS", "").lower() in ('1', 'true', 'yes') or bool(os.getenv("BOT_METRICS_PORT"))
+METRICS_PORT = int(os.getenv("BOT_METRICS_PORT") or 0)  # 0 means no endpoint in daemon mode
+METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.getenv("BOT_METRICS_FILE")  # Default: metrics/run-<UTC time>.json next to the bot
+METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Every metric with its type, help text and histogram buckets
+METRICS = {
+    'bot_source_seconds': ('histogram', "Time spent in each report source, e.g. weather or prices", LATENCY_BUCKETS),
+    'bot_source_failures_total': ('counter', "Report sources that failed, came back empty or missed their deadline", None),
+    'bot_provider_seconds': ('histogram', "Latency of each hedged price provider", LATENCY_BUCKETS),
+    'bot_http_phase_seconds': ('histogram', "HTTP request time per host and phase", LATENCY_BUCKETS),
+    'bot_http_response_bytes': ('histogram', "Size of HTTP response bodies per host", BYTES_BUCKETS),
+    'bot_http_requests_total': ('counter', "HTTP responses per host and status code", None),
+    'bot_http_retries_total': ('counter', "HTTP retries per host and reason", None),
+    'bot_http_errors_total': ('counter', "HTTP requests that failed without a response, per host and error", None),
+    'bot_cache_requests_total': ('counter', "Response cache lookups per host and result", None),
+    'bot_telegram_sends_total': ('counter', "Telegram sendMessage calls per status", None),
+}
+
+
+# Class to count observations into fixed buckets, Prometheus style
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    # Function to estimate a quantile by interpolating inside its bucket
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.bounds[index - 1] if index else 0.0
+                high = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(self.max, low + (high - low) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+
+# Class holding every histogram and counter, keyed by metric name and sorted labels
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def increment(self, name, amount, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+
+registry = Registry()
+
+
+# Function to record one observation of a histogram
+def observe(name, value, **labels):
+    if ENABLED:
+        registry.observe(name, value, labels)
+
+
+# Function to increase a counter
+def increment(name, amount=1, **labels):
+    if ENABLED:
+        registry.increment(name, amount, labels)
+
+
+# Context manager timing a block into a histogram
+class Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, time.perf_counter() - self.start, self.labels)
+
+
+# Context manager doing nothing, returned by timer() when metrics are disabled
+class NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NOOP_TIMER = NoopTimer()
+
+
+# Function to time a block, e.g. `with metrics.timer('bot_source_seconds', source='weather'):`
+def timer(name, **labels):
+    return Timer(name, labels) if ENABLED else NOOP_TIMER
+
+
+# Function to call a report source, recording its time and whether it failed.
+# A source that returns None or an empty result counts as failed, since that drops its section.
+def timed_call(source, func, *args):
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception:
+        increment('bot_source_failures_total', source=source, reason='error')
+        raise
+    finally:
+        observe('bot_source_seconds', time.perf_counter() - start, source=source)
+    if not result:
+        increment('bot_source_failures_total', source=source, reason='empty')
+    return result
+
+
+# Function to record a finished HTTP response: status, headers time, transfer time and size.
+# `total` is the time session.request() took; response.elapsed stops when the headers are parsed.
+def record_response(host, response, total, stream=False):
+    registry.increment('bot_http_requests_total', 1, {'host': host, 'status': str(response.status_code)})
+    headers = response.elapsed.total_seconds()
+    registry.observe('bot_http_phase_seconds', headers, {'host': host, 'phase': 'headers'})
+    if stream:
+        return  # The body is read by the caller, see count_bytes()
+    registry.observe('bot_http_phase_seconds', max(0.0, total - headers), {'host': host, 'phase': 'transfer'})
+    registry.observe('bot_http_response_bytes', len(response.content), {'host': host})
+
+    # Time JSON decoding where the fetchers call it
+    decode = response.json
+
+    def timed_json(**kwargs):
+        with Timer('bot_http_phase_seconds', {'host': host, 'phase': 'parse'}):
+            return decode(**kwargs)
+
+    response.json = timed_json
+
+
+# Function to pass the chunks of a streamed body through, recording its size once it is read
+def count_bytes(chunks, host):
+    if not ENABLED:
+        return chunks
+
+    def counted():
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Also runs when the reader stops early and the generator is closed
+            registry.observe('bot_http_response_bytes', size, {'host': host})
+
+    return counted()
+
+
+_dns = threading.local()
+
+
+# Stand-in for the socket module inside urllib3.util.connection that times getaddrinfo.
+# urllib3 still resolves (address family, every returned address) and connects itself.
+class TimedSocketModule:
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+    @staticmethod
+    def getaddrinfo(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return socket.getaddrinfo(*args, **kwargs)
+        finally:
+            _dns.seconds = getattr(_dns, 'seconds', 0.0) + time.perf_counter() - start
+
+
+# Function to build urllib3 connection classes that time DNS, TCP connect and the TLS handshake
+def make_timed_connection(base, tls):
+    class TimedConnection(base):
+        def _new_conn(self):
+            _dns.seconds = 0.0
+            start = time.perf_counter()
+            sock = super()._new_conn()
+            self._connect_time = time.perf_counter() - start
+            resolving = min(_dns.seconds, self._connect_time)
+            registry.observe('bot_http_phase_seconds', resolving, {'host': self.host, 'phase': 'dns'})
+            registry.observe('bot_http_phase_seconds', self._connect_time - resolving, {'host': self.host, 'phase': 'connect'})
+            return sock
+
+        def connect(self):
+            self._connect_time = 0.0
+            start = time.perf_counter()
+            super().connect()
+            if tls:
+                handshake = time.perf_counter() - start - self._connect_time
+                registry.observe('bot_http_phase_seconds', handshake, {'host': self.host, 'phase': 'tls'})
+
+    return TimedConnection
+
+
+# Function to make a requests HTTPAdapter open timed connections
+def instrument_adapter(adapter):
+    if not ENABLED:
+        return
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.util import connection
+
+    connection.socket = TimedSocketModule()
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = make_timed_connection(HTTPConnection, tls=False)
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = make_timed_connection(HTTPSConnection, tls=True)
+
+    adapter.poolmanager.pool_classes_by_scheme = {
+        'http': TimedHTTPConnectionPool,
+        'https': TimedHTTPSConnectionPool,
+    }
+
+
+# Helper function to escape a label value for the text format
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Helper function to format labels as {a="1",b="2"}
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+# Function to render every metric in the Prometheus text exposition format
+def render_prometheus():
+    with registry.lock:
+        histograms = {key: (list(h.counts), h.count, h.sum) for key, h in registry.histograms.items()}
+        counters = dict(registry.counters)
+
+    lines = []
+    for name, (kind, help_text, bounds) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            continue
+        for (metric, labels), (counts, count, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(bounds) + ['+Inf'], counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else f"{bound:g}"
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# Function to summarize the metrics of a run as a JSON-friendly dict
+def summary():
+    with registry.lock:
+        histograms = {}
+        for (name, labels), histogram in sorted(registry.histograms.items()):
+            histograms.setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': round(histogram.sum, 6),
+                'mean': round(histogram.sum / histogram.count, 6),
+                'p50': round(histogram.quantile(0.5), 6),
+                'p95': round(histogram.quantile(0.95), 6),
+                'max': round(histogram.max, 6),
+            })
+        counters = {}
+        for (name, labels), value in sorted(registry.counters.items()):
+            counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        started_at = registry.started_at
+
+    return {
+        'started_at': datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        'finished_at': datetime.now(timezone.utc).isoformat(),
+        'histograms': histograms,
+        'counters': counters,
+    }
+
+
+# Function to write the summary of a one-shot run, returns the path or None
+def write_summary(path=None):
+    if not ENABLED:
+        return None
+    path = path or METRICS_FILE or os.path.join(
+        METRICS_DIR, f"run-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary(), f, indent=2)
+    except OSError as e:
+        print(f"Error writing metrics summary to {path}: {e}")
+        return None
+    return path
+
+
+# Function to serve /metrics from a background thread, returns the server (call shutdown() to stop)
+def start_server(port=METRICS_PORT, host=METRICS_HOST):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
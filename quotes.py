@@ -0,0 +1,155 @@
+import codecs
+import json
+
+# Compact coin quotes and an incremental JSON array parser, so the cryptorank
+# currency list is filtered while it streams in instead of being loaded whole.
+
+# Report labels mapped to CoinQuote attributes
+FIELD_LABELS = {
+    'Price': 'price',
+    'Volume (24h)': 'volume_24h',
+    'High (24h)': 'high_24h',
+    'Low (24h)': 'low_24h',
+    'Market Cap': 'market_cap',
+    'Percent Change (24h)': 'change_24h',
+    'Percent Change (7d)': 'change_7d',
+    'Percent Change (30d)': 'change_30d',
+    'Percent Change (3m)': 'change_3m',
+    'Percent Change (6m)': 'change_6m',
+}
+
+
+# Class to hold a single coin quote without a per-instance dict
+class CoinQuote:
+    __slots__ = ('id', 'symbol', 'name', 'rank') + tuple(FIELD_LABELS.values())
+
+    def __init__(self, id, symbol, name, rank=None, **values):
+        self.id = id
+        self.symbol = symbol
+        self.name = name
+        self.rank = rank
+        for attribute in FIELD_LABELS.values():
+            setattr(self, attribute, values.get(attribute))
+
+    # Function to build a quote from a cryptorank /v1/currencies item
+    @classmethod
+    def from_cryptorank(cls, item):
+        values = item['values']['USD']
+        return cls(
+            item['id'], item['symbol'], item['name'], item.get('rank'),
+            price=values.get('price'),
+            volume_24h=values.get('volume24h'),
+            high_24h=values.get('high24h'),
+            low_24h=values.get('low24h'),
+            market_cap=values.get('marketCap'),
+            change_24h=values.get('percentChange24h'),
+            change_7d=values.get('percentChange7d'),
+            change_30d=values.get('percentChange30d'),
+            change_3m=values.get('percentChange3m'),
+            change_6m=values.get('percentChange6m'),
+        )
+
+    # Dict-style access by report label, e.g. quote.get('Price')
+    def get(self, label, default=None):
+        value = getattr(self, FIELD_LABELS[label], None) if label in FIELD_LABELS else None
+        return default if value is None else value
+
+
+# Class to index quotes by symbol and by id
+class QuoteBook:
+    def __init__(self):
+        self.by_symbol = {}
+        self.by_id = {}
+
+    # Function to add a quote; on symbol clashes the best ranked coin keeps the symbol
+    def add(self, quote):
+        self.by_id[quote.id] = quote
+        current = self.by_symbol.get(quote.symbol)
+        if current is None or (quote.rank or float('inf')) < (current.rank or float('inf')):
+            self.by_symbol[quote.symbol] = quote
+
+    # Function to look a quote up by symbol or id
+    def get(self, key, default=None):
+        return self.by_symbol.get(key) or self.by_id.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.by_symbol or key in self.by_id
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+
+# Helper function to skip whitespace (and the given separators) from `position`
+def skip_whitespace(text, position, separators=''):
+    while position < len(text) and text[position] in ' \t\r\n' + separators:
+        position += 1
+    return position
+
+
+# Function to yield the items of the JSON array stored under the top-level `key` of an
+# object, from byte chunks. Only the value being decoded is kept in memory, the rest of
+# the document is discarded. Raises ValueError if the stream ends before the array is closed.
+def iter_json_array(chunks, key='data'):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    state = 'object'  # object -> key -> colon -> value -> key ... until the array, then item
+    current_key = None
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        while True:
+            position = skip_whitespace(buffer, position, ',' if state in ('key', 'item') else '')
+            if position == len(buffer):
+                break
+            char = buffer[position]
+
+            if state == 'object':
+                if char != '{':
+                    raise ValueError("Expected a JSON object")
+                position += 1
+                state = 'key'
+            elif state == 'key':
+                if char == '}':
+                    raise ValueError(f"No '{key}' array in the JSON object")
+                try:
+                    current_key, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break  # The key is incomplete, wait for the next chunk
+                if not isinstance(current_key, str):
+                    raise ValueError("Expected an object key")
+                position = end
+                state = 'colon'
+            elif state == 'colon':
+                if char != ':':
+                    raise ValueError("Expected ':' after an object key")
+                position += 1
+                state = 'value'
+            elif state == 'value' and current_key == key:
+                if char != '[':
+                    raise ValueError(f"'{key}' is not an array")
+                position += 1
+                state = 'item'
+            else:
+                if state == 'item' and char == ']':
+                    return
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break  # The value is incomplete, wait for the next chunk
+                if end == len(buffer):
+                    break  # A number could go on in the next chunk
+                position = end
+                if state == 'item':
+                    yield value
+                else:
+                    state = 'key'  # Skip values of other keys, including nested "data" fields
+
+        buffer = buffer[position:]
+        position = 0
+
+    raise ValueError(f"JSON stream ended before the '{key}' array was closed")
@@ -0,0 +1,182 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# In-process scheduler for the daemon mode: jobs fire on a cron expression or a
+# fixed interval, each evaluated in its own UTC offset, until stop() is called.
+
+FIELD_RANGES = (
+    (0, 59),  # Minute
+    (0, 23),  # Hour
+    (1, 31),  # Day of month
+    (1, 12),  # Month
+    (0, 7),  # Day of week, 0 and 7 are Sunday
+)
+MAX_JOB_WORKERS = 4
+RELOAD_INTERVAL = 60  # Seconds between calls to the scheduler's reload function
+
+
+# Function to parse one cron field ("*", "5", "1-5", "*/15", "0,30") into a set of values
+def parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(value) for value in part.split('-'))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+# Class to match times against a five-field cron expression
+class CronExpression:
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted either one may match
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    # Function to find the first matching minute strictly after `moment`
+    def next_after(self, moment):
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 4)
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError("Cron expression never matches")
+
+
+# Class describing a scheduled job
+class Job:
+    def __init__(self, name, func, cron=None, interval=None, utc_offset=0):
+        if (cron is None) == (interval is None):
+            raise ValueError(f"Job {name} needs either a cron expression or an interval")
+        self.name = name
+        self.func = func
+        self.key = (name, cron, interval, utc_offset)  # Jobs with the same key are the same job
+        self.cron = CronExpression(cron) if cron else None
+        self.interval = interval
+        self.tz = timezone(timedelta(hours=utc_offset))
+        self.next_run = self.compute_next_run(datetime.now(timezone.utc))
+
+    # Function to compute the next run time (UTC) after `now`
+    def compute_next_run(self, now):
+        if self.interval:
+            return now + timedelta(seconds=self.interval)
+        return self.cron.next_after(now.astimezone(self.tz)).astimezone(timezone.utc)
+
+
+# Class to run jobs at their scheduled times until stopped.
+# `reload` is called every `reload_interval` seconds and returns a new list of jobs,
+# or None when nothing changed; jobs whose schedule is unchanged keep their next run.
+class Scheduler:
+    def __init__(self, reload=None, reload_interval=RELOAD_INTERVAL):
+        self.jobs = []
+        self.shutdown_hooks = []
+        self.stop_event = threading.Event()
+        self.reload = reload
+        self.reload_interval = reload_interval
+
+    def add_job(self, job):
+        self.jobs.append(job)
+        print(f"Scheduled {job.name}, next run at {job.next_run:%Y-%m-%d %H:%M} UTC")
+
+    # Function to replace the jobs, keeping the existing ones with the same key
+    def set_jobs(self, jobs):
+        current = {job.key: job for job in self.jobs}
+        self.jobs = []
+        for job in jobs:
+            existing = current.pop(job.key, None)
+            if existing is not None:
+                self.jobs.append(existing)
+            else:
+                self.add_job(job)
+        for job in current.values():
+            print(f"Unscheduled {job.name}")
+
+    def _reload(self):
+        try:
+            jobs = self.reload()
+        except Exception as e:
+            print(f"Error reloading jobs: {e}")
+            return
+        if jobs is not None:
+            self.set_jobs(jobs)
+
+    # Function to register a function called once when the scheduler stops
+    def add_shutdown_hook(self, func):
+        self.shutdown_hooks.append(func)
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def _run_job(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            print(f"Error running {job.name}: {e}")
+        print(f"{job.name} finished in {time.monotonic() - started:.2f}s")
+
+    # Function to run the scheduling loop, blocks until stop() is called.
+    # A job still running (or waiting for a worker) when it is due again skips that run.
+    def run(self):
+        executor = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS)
+        running = {}
+        next_reload = time.monotonic()
+        try:
+            while not self.stop_event.is_set() and (self.jobs or self.reload):
+                if self.reload and time.monotonic() >= next_reload:
+                    next_reload = time.monotonic() + self.reload_interval
+                    self._reload()
+                    running = {job: future for job, future in running.items() if job in self.jobs}
+
+                now = datetime.now(timezone.utc)
+                due = [job for job in self.jobs if job.next_run <= now]
+                for job in due:
+                    job.next_run = job.compute_next_run(now)
+                    if job in running and not running[job].done():
+                        print(f"{job.name} is still running, skipping this run")
+                        continue
+                    running[job] = executor.submit(self._run_job, job)
+
+                wait_times = [(job.next_run - datetime.now(timezone.utc)).total_seconds() for job in self.jobs]
+                if self.reload:
+                    wait_times.append(next_reload - time.monotonic())
+                self.stop_event.wait(max(0, min(wait_times)))
+        finally:
+            # Let running jobs finish, drop the ones still waiting for a worker
+            executor.shutdown(wait=True, cancel_futures=True)
+            for hook in self.shutdown_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"Error in shutdown hook: {e}")
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from alerts import ALERT_COOLDOWN, AlertEngine, build_alert_messages, parse_rule
+
+NOW = 1_700_000_000
+
+
+def make_rule(rule_id, text, chat_id='1'):
+    rule = parse_rule(text)
+    rule.update(id=rule_id, chat_id=chat_id)
+    return rule
+
+
+def fired_ids(fired):
+    return sorted(rule['id'] for rule, _ in fired)
+
+
+def test_parse_rule():
+    assert parse_rule("btc crosses 70k") == {'symbol': 'BTC', 'kind': 'crosses', 'threshold': 70000.0}
+    assert parse_rule("USD→MDL above 18") == {'symbol': 'USD/MDL', 'kind': 'above', 'threshold': 18.0}
+    assert parse_rule("PEPE ±10% in 1h") == {
+        'symbol': 'PEPE', 'kind': 'move', 'threshold': 10.0, 'direction': 'both', 'window': 3600,
+    }
+    with pytest.raises(ValueError):
+        parse_rule("BTC to the moon")
+
+
+def test_first_value_only_seeds_the_state():
+    engine = AlertEngine([make_rule(1, "BTC above 100")])
+    assert engine.evaluate({'BTC': 150}, now=NOW) == []
+    assert engine.last_values == {'BTC': 150}
+
+
+def test_upward_crossing_includes_the_current_value_only():
+    # Going up, thresholds in (previous, current] fire
+    engine = AlertEngine([make_rule(1, "BTC above 100"), make_rule(2, "BTC above 110"), make_rule(3, "BTC above 111")])
+    engine.evaluate({'BTC': 100}, now=NOW)
+    assert fired_ids(engine.evaluate({'BTC': 110}, now=NOW)) == [2]
+
+
+def test_downward_crossing_includes_the_current_value_only():
+    # Going down, thresholds in [current, previous) fire
+    engine = AlertEngine([make_rule(1, "BTC below 110"), make_rule(2, "BTC below 100"), make_rule(3, "BTC below 99")])
+    engine.evaluate({'BTC': 110}, now=NOW)
+    assert fired_ids(engine.evaluate({'BTC': 100}, now=NOW)) == [2]
+
+
+def test_crosses_fires_in_both_directions():
+    engine = AlertEngine([make_rule(1, "BTC crosses 100")])
+    engine.evaluate({'BTC': 90}, now=NOW)
+    assert fired_ids(engine.evaluate({'BTC': 105}, now=NOW)) == [1]
+    assert fired_ids(engine.evaluate({'BTC': 95}, now=NOW + ALERT_COOLDOWN)) == [1]
+
+
+def test_unchanged_value_fires_nothing():
+    engine = AlertEngine([make_rule(1, "BTC above 100")])
+    engine.evaluate({'BTC': 100}, now=NOW)
+    assert engine.evaluate({'BTC': 100}, now=NOW) == []
+
+
+def test_moves_by_direction():
+    rules = [make_rule(1, "PEPE +5% in 1h"), make_rule(2, "PEPE -5% in 1h"), make_rule(3, "PEPE ±5% in 1h")]
+    engine = AlertEngine(rules)
+    assert engine.move_windows() == [('PEPE', 3600)]
+
+    assert fired_ids(engine.evaluate({'PEPE': 1}, {('PEPE', 3600): 6.0}, now=NOW)) == [1, 3]
+    engine = AlertEngine(rules)
+    assert fired_ids(engine.evaluate({'PEPE': 1}, {('PEPE', 3600): -6.0}, now=NOW)) == [2, 3]
+
+
+def test_moves_that_change_sign():
+    engine = AlertEngine([make_rule(1, "PEPE +5% in 1h"), make_rule(2, "PEPE -5% in 1h"), make_rule(3, "PEPE ±5% in 1h")])
+    assert fired_ids(engine.evaluate({'PEPE': 1}, {('PEPE', 3600): 6.0}, now=NOW)) == [1, 3]
+    # From +6% straight to -6%: the downward rules fire, the ± one is still cooling down
+    assert fired_ids(engine.evaluate({'PEPE': 1}, {('PEPE', 3600): -6.0}, now=NOW + 60)) == [2]
+    # And back up once the cooldown is over
+    later = NOW + 60 + ALERT_COOLDOWN
+    assert fired_ids(engine.evaluate({'PEPE': 1}, {('PEPE', 3600): 6.0}, now=later)) == [1, 3]
+
+
+def test_moves_fire_again_only_after_falling_back():
+    engine = AlertEngine([make_rule(1, "PEPE +5% in 1h")])
+    assert fired_ids(engine.evaluate({}, {('PEPE', 3600): 6.0}, now=NOW)) == [1]
+    later = NOW + ALERT_COOLDOWN
+    # Still above the threshold, nothing was crossed
+    assert engine.evaluate({}, {('PEPE', 3600): 7.0}, now=later) == []
+    assert engine.evaluate({}, {('PEPE', 3600): 2.0}, now=later) == []
+    assert fired_ids(engine.evaluate({}, {('PEPE', 3600): 5.0}, now=later)) == [1]
+
+
+def test_missing_change_is_skipped():
+    engine = AlertEngine([make_rule(1, "PEPE +5% in 1h")])
+    assert engine.evaluate({}, {('PEPE', 3600): None}, now=NOW) == []
+    assert fired_ids(engine.evaluate({}, {('PEPE', 3600): 6.0}, now=NOW)) == [1]
+
+
+def test_cooldown_deduplicates():
+    engine = AlertEngine([make_rule(1, "BTC crosses 100")])
+    engine.evaluate({'BTC': 90}, now=NOW)
+    assert fired_ids(engine.evaluate({'BTC': 110}, now=NOW)) == [1]
+    assert engine.evaluate({'BTC': 90}, now=NOW + ALERT_COOLDOWN - 1) == []
+    assert fired_ids(engine.evaluate({'BTC': 110}, now=NOW + ALERT_COOLDOWN)) == [1]
+
+
+def test_state_survives_a_json_round_trip():
+    rules = [make_rule(1, "BTC above 100"), make_rule(2, "PEPE +5% in 1h")]
+    engine = AlertEngine(rules)
+    engine.evaluate({'BTC': 90, 'PEPE': 1}, {('PEPE', 3600): 1.0}, now=NOW)
+    assert fired_ids(engine.evaluate({'BTC': 110}, {('PEPE', 3600): 6.0}, now=NOW)) == [1, 2]
+
+    state = json.loads(json.dumps(engine.state(now=NOW)))
+    restored = AlertEngine(rules, state)
+    assert restored.last_values == {'BTC': 110, 'PEPE': 1}
+    assert restored.last_fired == {1: NOW, 2: NOW}
+
+    # Crossing again within the restored cooldown stays quiet
+    restored.evaluate({'BTC': 90}, now=NOW + 10)
+    assert restored.evaluate({'BTC': 110}, now=NOW + 20) == []
+
+    # The previous values come from the state, so no crossing is seen here
+    restored = AlertEngine(rules, state)
+    assert restored.evaluate({'BTC': 120}, {('PEPE', 3600): 7.0}, now=NOW + ALERT_COOLDOWN) == []
+
+
+def test_state_drops_expired_cooldowns():
+    engine = AlertEngine([make_rule(1, "BTC above 100")])
+    engine.evaluate({'BTC': 90}, now=NOW)
+    engine.evaluate({'BTC': 110}, now=NOW)
+    assert engine.state(now=NOW + ALERT_COOLDOWN - 1)['last_fired'] == {'1': NOW}
+    assert engine.state(now=NOW + ALERT_COOLDOWN)['last_fired'] == {}
+
+
+def test_build_alert_messages_groups_per_chat():
+    rules = {1: make_rule(1, "BTC above 100", chat_id='1'), 2: make_rule(2, "BTC above 101", chat_id='2')}
+    messages = build_alert_messages([(rules[1], "a"), (rules[1], "a"), (rules[1], "b"), (rules[2], "c")])
+    assert messages == {'1': "🚨 a\n🚨 b", '2': "🚨 c"}
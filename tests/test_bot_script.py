@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+import bot_script
+from quotes import CoinQuote, QuoteBook
+from timeseries import TimeSeriesStore
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    store = TimeSeriesStore(str(tmp_path))
+    monkeypatch.setattr(bot_script, 'history', store)
+    return store
+
+
+def test_record_snapshot_keeps_the_best_ranked_coin_per_symbol(history):
+    book = QuoteBook()
+    book.add(CoinQuote(11419, 'TON', 'Toncoin', 10, price=5.0))
+    book.add(CoinQuote(3357, 'TON', 'Tokamak Network', 600, price=1.2))
+    book.add(CoinQuote(1, 'BTC', 'Bitcoin', 1, price=67000.0))
+
+    snapshot = bot_script.record_snapshot(
+        prices={'Ethereum': {'Price': 3000.0, 'Source': 'coingecko'}},
+        crypto_prices=book,
+        exchange_rates={'USD to MDL': 17.8},
+    )
+
+    assert snapshot == {'ETH': 3000.0, 'TON': 5.0, 'BTC': 67000.0, 'USD/MDL': 17.8}
+    with history.open('TON') as view:
+        assert list(view.values) == [5.0]
+    with history.open('USD/MDL') as view:
+        assert list(view.values) == [17.8]
+
+
+def test_record_snapshot_without_data(history):
+    assert bot_script.record_snapshot() == {}
+    assert history.series() == []
+
+
+# Helper function to build a source that sleeps before returning its value
+def sleeping(seconds, value):
+    def fetch():
+        time.sleep(seconds)
+        return value
+    return fetch, ()
+
+
+def test_fetch_all_skips_sources_past_their_deadline(capsys):
+    release = threading.Event()
+
+    def stuck():
+        release.wait(5)
+        return 'late'
+
+    start = time.monotonic()
+    try:
+        results = bot_script.fetch_all(
+            {'fast': sleeping(0.05, 'fast'), 'slow': sleeping(0.2, 'slow'), 'stuck': (stuck, ())},
+            deadlines={'fast': 1, 'slow': 1, 'stuck': 0.3},
+        )
+    finally:
+        release.set()
+    elapsed = time.monotonic() - start
+
+    assert results == {'fast': 'fast', 'slow': 'slow', 'stuck': None}
+    assert 0.3 <= elapsed < 0.5  # The stuck source's deadline, not its 5s
+    assert "Deadline exceeded for stuck, skipping it" in capsys.readouterr().out
+
+
+def test_fetch_all_waits_only_for_the_slowest_source():
+    start = time.monotonic()
+    results = bot_script.fetch_all({'a': sleeping(0.1, 1), 'b': sleeping(0.2, 2), 'c': sleeping(0.05, 3)})
+    elapsed = time.monotonic() - start
+
+    assert results == {'a': 1, 'b': 2, 'c': 3}
+    assert 0.2 <= elapsed < 0.35  # Concurrent, so not the 0.35s sum
+
+
+def test_fetch_all_turns_errors_into_none(capsys):
+    def broken(symbol):
+        raise ValueError(f"no quote for {symbol}")
+
+    results = bot_script.fetch_all({'broken': (broken, ('XYZ',)), 'ok': sleeping(0, 'ok')})
+
+    assert results == {'broken': None, 'ok': 'ok'}
+    assert "Error fetching broken: no quote for XYZ" in capsys.readouterr().out
+
+
+def test_fetch_all_global_deadline_caps_every_source():
+    start = time.monotonic()
+    results = bot_script.fetch_all(
+        {'slow': sleeping(0.5, 'slow'), 'fast': sleeping(0, 'fast')},
+        deadlines={'slow': 10}, global_deadline=0.1,
+    )
+
+    assert results == {'slow': None, 'fast': 'fast'}
+    assert time.monotonic() - start < 0.3
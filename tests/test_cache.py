@@ -0,0 +1,176 @@
+import os
+
+import pytest
+import requests
+
+import cache
+from cache import DiskCache, cached_get_json
+
+URL = 'https://api.example.com/rates'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    disk_cache = DiskCache(str(tmp_path))
+    monkeypatch.setattr(cache, 'cache', disk_cache)
+    return disk_cache
+
+
+# Class to stand in for the provider: hands out queued responses and records request headers
+class FakeServer:
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def append(self, response):
+        self.responses.append(response)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append(headers)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(cache.http_client, 'get', server.get)
+    return server
+
+
+# Helper function to age an entry as if it was stored `seconds` ago
+def age(disk_cache, key, seconds):
+    disk_cache.memory[key]['stored_at'] -= seconds
+
+
+def test_fresh_entry_is_served_without_a_request(disk_cache, server):
+    server.append(FakeResponse(payload={'rate': 17.8}))
+    assert cached_get_json(URL, ttl=60) == {'rate': 17.8}
+    assert cached_get_json(URL, ttl=60) == {'rate': 17.8}
+    assert len(server.requests) == 1
+
+
+def test_entries_survive_a_restart(disk_cache, server, tmp_path):
+    server.append(FakeResponse(payload={'rate': 17.8}))
+    cached_get_json(URL, params={'base': 'USD'}, ttl=60)
+    assert DiskCache(str(tmp_path)).get(URL + '?base=USD')['value'] == {'rate': 17.8}
+
+
+def test_expired_entry_is_revalidated(disk_cache, server):
+    server.append(FakeResponse(payload={'rate': 17.8}, headers={
+        'ETag': '"v1"', 'Last-Modified': 'Sun, 18 Oct 2026 09:00:00 GMT',
+    }))
+    cached_get_json(URL, ttl=60)
+    age(disk_cache, URL, 120)
+
+    server.append(FakeResponse(304))
+    assert cached_get_json(URL, ttl=60) == {'rate': 17.8}
+    assert server.requests[1] == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Sun, 18 Oct 2026 09:00:00 GMT',
+    }
+    # The 304 renewed the TTL
+    assert cached_get_json(URL, ttl=60) == {'rate': 17.8}
+    assert len(server.requests) == 2
+
+
+def test_changed_document_replaces_the_entry(disk_cache, server):
+    server.append(FakeResponse(payload={'rate': 17.8}, headers={'ETag': '"v1"'}))
+    cached_get_json(URL, ttl=60)
+    age(disk_cache, URL, 120)
+
+    server.append(FakeResponse(payload={'rate': 17.9}, headers={'ETag': '"v2"'}))
+    assert cached_get_json(URL, ttl=60) == {'rate': 17.9}
+    assert disk_cache.get(URL)['etag'] == '"v2"'
+
+
+def test_stale_entry_is_served_within_the_grace_window(disk_cache, server, capsys):
+    server.append(FakeResponse(payload={'rate': 17.8}))
+    cached_get_json(URL, ttl=60)
+    age(disk_cache, URL, 120)
+
+    server.append(requests.ConnectionError("provider down"))
+    assert cached_get_json(URL, ttl=60, stale_grace=3600) == {'rate': 17.8}
+    assert "Serving stale cache" in capsys.readouterr().out
+
+    server.append(FakeResponse(503))
+    assert cached_get_json(URL, ttl=60, stale_grace=3600) == {'rate': 17.8}
+
+
+def test_failure_past_the_grace_window_raises(disk_cache, server):
+    server.append(FakeResponse(payload={'rate': 17.8}))
+    cached_get_json(URL, ttl=60)
+    age(disk_cache, URL, 7200)
+
+    server.append(requests.ConnectionError("provider down"))
+    with pytest.raises(requests.ConnectionError):
+        cached_get_json(URL, ttl=60, stale_grace=3600)
+
+
+def test_failure_without_an_entry_raises(disk_cache, server):
+    server.append(requests.ConnectionError("provider down"))
+    with pytest.raises(requests.ConnectionError):
+        cached_get_json(URL, ttl=60)
+
+
+# Helper function to set the last-used time of an entry on disk
+def touch(disk_cache, key, mtime):
+    os.utime(disk_cache._path(key), (mtime, mtime))
+
+
+def test_least_recently_used_entries_are_evicted_by_count(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_entries=2)
+    disk_cache.set('a', 1)
+    disk_cache.set('b', 2)
+    touch(disk_cache, 'a', 1000)
+    touch(disk_cache, 'b', 900)  # "b" is the least recently used
+
+    disk_cache.set('c', 3)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(disk_cache._path(key)) for key in ('a', 'c'))
+    assert DiskCache(str(tmp_path)).get('b') is None
+    assert DiskCache(str(tmp_path)).get('a')['value'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    disk_cache = DiskCache(str(tmp_path))
+    disk_cache.set('a', 'x' * 1000)
+    disk_cache.set('b', 'x' * 1000)
+    touch(disk_cache, 'a', 900)  # "a" is the least recently used
+    touch(disk_cache, 'b', 1000)
+    size = os.path.getsize(disk_cache._path('a'))
+
+    disk_cache.max_bytes = 2 * size + size // 2
+    disk_cache.set('c', 'x' * 1000)
+    fresh = DiskCache(str(tmp_path))
+    assert fresh.get('a') is None
+    assert fresh.get('b')['value'] == 'x' * 1000
+    assert fresh.get('c')['value'] == 'x' * 1000
+
+
+def test_reading_an_entry_marks_it_as_used(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_entries=2)
+    disk_cache.set('a', 1)
+    disk_cache.set('b', 2)
+    touch(disk_cache, 'a', 900)
+    touch(disk_cache, 'b', 1000)
+
+    disk_cache.get('a')  # Now "b" is the least recently used
+    disk_cache.set('c', 3)
+    fresh = DiskCache(str(tmp_path))
+    assert fresh.get('a')['value'] == 1
+    assert fresh.get('b') is None
@@ -0,0 +1,73 @@
+import delivery
+import http_client
+from delivery import ChatSlots, RateLimiter, split_message, telegram_length
+
+
+def test_telegram_length_counts_utf16_units():
+    assert telegram_length("abc") == 3
+    assert telegram_length("привет") == 6
+    assert telegram_length("🦀") == 2
+
+
+def test_short_message_is_one_part():
+    assert split_message("hello\nworld") == ["hello\nworld"]
+    assert split_message("") == []
+
+
+def test_split_prefers_line_breaks():
+    text = "aaaa\nbbbb\ncccc\n"
+    assert split_message(text, limit=10) == ["aaaa\nbbbb\n", "cccc\n"]
+
+
+def test_long_line_is_cut_within_the_limit():
+    parts = split_message("x" * 25, limit=10)
+    assert parts == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_split_never_breaks_a_surrogate_pair():
+    text = "🦀" * 7  # 14 UTF-16 units
+    parts = split_message(text, limit=5)
+    assert "".join(parts) == text
+    assert all(telegram_length(part) <= 5 for part in parts)
+    assert parts == ["🦀🦀", "🦀🦀", "🦀🦀", "🦀"]
+
+
+def test_split_keeps_every_character():
+    text = "\n".join(f"📢 строка {index} 🦀" for index in range(500))
+    parts = split_message(text, limit=100)
+    assert "".join(parts) == text
+    assert all(telegram_length(part) <= 100 for part in parts)
+
+
+def test_rate_limiter_spaces_reservations():
+    limiter = RateLimiter(10)
+    waits = [limiter.reserve() for _ in range(3)]
+    assert waits[0] == 0
+    assert 0.09 < waits[1] <= 0.1
+    assert 0.19 < waits[2] <= 0.2
+
+
+def test_chat_slots_block_until_the_interval_passes():
+    slots = ChatSlots()
+    assert slots.claim('1', 60) == 0
+    assert slots.claim('1', 60) > 59
+    assert slots.claim('2', 60) == 0
+    slots.defer('2', 0)  # Deferring to an earlier time keeps the later one
+    assert slots.claim('2', 60) > 59
+
+
+def test_send_errors_do_not_leak_the_bot_token(monkeypatch, capsys):
+    def send_part(bot_token, chat_id, text):
+        raise ConnectionError(f"Max retries exceeded with url: /api.telegram.org/bot{bot_token}/sendMessage")
+
+    monkeypatch.setattr(delivery, 'send_part', send_part)
+    monkeypatch.setattr(delivery, 'chat_slots', ChatSlots())
+    monkeypatch.setattr(delivery, 'PRIVATE_CHAT_INTERVAL', 0)
+    monkeypatch.setattr(http_client, 'backoff_delay', lambda attempt: 0)
+
+    report = delivery.deliver_messages({'42': "hello"}, bot_token='123456:SECRET')
+
+    assert report['failed'] == 1
+    assert report['chats']['42']['attempts'] == delivery.MAX_ATTEMPTS
+    assert report['chats']['42']['error'] == "ConnectionError sending to api.telegram.org"
+    assert 'SECRET' not in capsys.readouterr().out
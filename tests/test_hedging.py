@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+import hedging
+from cache import DiskCache
+from hedging import DEFAULT_HEDGE_DELAY, LatencyTracker, get_tracker, hedged_fetch
+
+
+@pytest.fixture(autouse=True)
+def trackers(tmp_path, monkeypatch):
+    monkeypatch.setattr(hedging, 'cache', DiskCache(str(tmp_path)))
+    monkeypatch.setattr(hedging, '_trackers', None)
+
+
+def provider(values, delay=0.0, error=None, calls=None):
+    def fetch(keys):
+        if calls is not None:
+            calls.append((time.monotonic(), list(keys)))
+        time.sleep(delay)
+        if error:
+            raise error
+        return {key: value for key, value in values.items() if key in keys}
+    return fetch
+
+
+def test_p95_is_the_nearest_rank():
+    assert LatencyTracker([0.1, 0.2, 0.3]).p95() == DEFAULT_HEDGE_DELAY
+    assert LatencyTracker([0.1, 0.2, 0.3, 0.4, 0.5]).p95() == 0.5
+    assert LatencyTracker([index / 100 for index in range(1, 51)]).p95() == 0.48
+
+
+def test_fast_primary_is_not_hedged():
+    calls = []
+    providers = [('primary', provider({'a': 1, 'b': 2})), ('secondary', provider({'a': 9}, calls=calls))]
+    assert hedged_fetch(providers, ['a', 'b'], 2) == {'a': (1, 'primary'), 'b': (2, 'primary')}
+    assert calls == []
+
+
+def test_slow_primary_is_hedged_after_its_p95():
+    for _ in range(5):
+        get_tracker('primary').record(0.1)
+    calls = []
+    providers = [('primary', provider({'a': 1}, delay=1.0)), ('secondary', provider({'a': 2}, calls=calls))]
+
+    start = time.monotonic()
+    assert hedged_fetch(providers, ['a'], 2) == {'a': (2, 'secondary')}
+    assert time.monotonic() - start < 0.5
+    hedged_after = calls[0][0] - start
+    assert 0.09 <= hedged_after < 0.3
+
+
+def test_failing_primary_hands_over_immediately():
+    calls = []
+    providers = [
+        ('primary', provider({}, error=RuntimeError("down"))),
+        ('secondary', provider({'a': 2}, calls=calls)),
+    ]
+
+    start = time.monotonic()
+    assert hedged_fetch(providers, ['a'], 5) == {'a': (2, 'secondary')}
+    # Well before the default hedge delay
+    assert calls[0][0] - start < 0.2
+    # The failure is not a latency sample
+    time.sleep(0.05)  # Samples are recorded from the worker threads
+    assert get_tracker('primary').samples == []
+    assert len(get_tracker('secondary').samples) == 1
+
+
+def test_partial_answer_is_filled_in_by_the_next_provider():
+    calls = []
+    providers = [
+        ('primary', provider({'a': 1, 'b': None})),
+        ('secondary', provider({'a': 9, 'b': 2, 'c': 3}, calls=calls)),
+    ]
+    assert hedged_fetch(providers, ['a', 'b', 'c'], 2) == {
+        'a': (1, 'primary'), 'b': (2, 'secondary'), 'c': (3, 'secondary'),
+    }
+    assert calls[0][1] == ['b', 'c']
+
+
+def test_nothing_before_the_deadline():
+    providers = [('primary', provider({'a': 1}, delay=1.0)), ('secondary', provider({'a': 2}, delay=1.0))]
+    start = time.monotonic()
+    assert hedged_fetch(providers, ['a'], 0.2) == {}
+    assert time.monotonic() - start < 0.5
+
+
+def test_latencies_are_persisted(tmp_path):
+    hedged_fetch([('primary', provider({'a': 1}))], ['a'], 2)
+    time.sleep(0.05)  # Samples are recorded from the worker threads
+    hedging.save_latencies()
+    hedging._trackers = None
+    assert len(get_tracker('primary').samples) == 1
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+import http_client
+import metrics
+from http_client import TokenBucket, parse_retry_after
+
+URL = 'https://api.example.com/v1/quotes'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+# Class to stand in for the pooled session: hands out queued responses or raises queued errors
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    return sleeps
+
+
+# Helper function to swap the shared session for a fake one
+def use_session(monkeypatch, *responses):
+    session = FakeSession(*responses)
+    monkeypatch.setattr(http_client, '_session', session)
+    return session
+
+
+# Helper function to format an HTTP date `seconds` from now
+def http_date(seconds):
+    return format_datetime(datetime.now(timezone.utc) + timedelta(seconds=seconds), usegmt=True)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('1.5') == 1.5
+    assert parse_retry_after('-2') == 0.0
+    assert 3 < parse_retry_after(http_date(5)) <= 5
+    assert parse_retry_after(http_date(-60)) == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+
+
+def test_success_is_not_retried(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(200))
+    assert http_client.get(URL).status_code == 200
+    assert session.calls == 1
+    assert sleeps == []
+
+
+def test_retry_after_seconds_is_honoured(monkeypatch, sleeps):
+    throttled = FakeResponse(429, {'Retry-After': '2'})
+    session = use_session(monkeypatch, throttled, FakeResponse(200))
+
+    assert http_client.get(URL).status_code == 200
+    assert session.calls == 2
+    assert throttled.closed
+    assert len(sleeps) == 1 and 2 <= sleeps[0] <= 2 + http_client.BACKOFF_BASE
+
+
+def test_retry_after_http_date_is_honoured(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(503, {'Retry-After': http_date(5)}), FakeResponse(200))
+
+    assert http_client.get(URL).status_code == 200
+    assert session.calls == 2
+    assert len(sleeps) == 1 and 3 < sleeps[0] <= 5 + http_client.BACKOFF_BASE
+
+
+def test_retry_after_beyond_the_backoff_cap_is_returned(monkeypatch, sleeps):
+    throttled = FakeResponse(429, {'Retry-After': str(http_client.BACKOFF_MAX + 1)})
+    session = use_session(monkeypatch, throttled, FakeResponse(200))
+
+    assert http_client.get(URL) is throttled
+    assert session.calls == 1
+    assert sleeps == []
+
+
+def test_retries_stop_after_max_retries(monkeypatch, sleeps):
+    responses = [FakeResponse(502) for _ in range(5)]
+    session = use_session(monkeypatch, *responses)
+
+    assert http_client.get(URL, max_retries=2) is responses[2]
+    assert session.calls == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= http_client.BACKOFF_MAX for delay in sleeps)
+
+
+def test_client_errors_are_not_retried(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(404), FakeResponse(200))
+    assert http_client.get(URL).status_code == 404
+    assert session.calls == 1
+
+
+def test_connection_errors_are_retried_then_raised(monkeypatch, sleeps):
+    session = use_session(monkeypatch, *[requests.ConnectionError("refused") for _ in range(3)])
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(URL, max_retries=2)
+    assert session.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_timeout_then_success(monkeypatch, sleeps):
+    session = use_session(monkeypatch, requests.Timeout("read timed out"), FakeResponse(200))
+    assert http_client.get(URL).status_code == 200
+    assert session.calls == 2
+
+
+def test_rate_limited_hosts_share_a_bucket(monkeypatch):
+    monkeypatch.setattr(http_client, '_buckets', {})
+    monkeypatch.setitem(http_client.RATE_LIMITS, 'api.example.com', (1, 5))
+    bucket = http_client.get_bucket('api.example.com')
+    assert http_client.get_bucket('api.example.com') is bucket
+    assert http_client.get_bucket('unlimited.example.com') is None
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    times = []
+    for _ in range(4):
+        bucket.acquire()
+        times.append(time.monotonic() - start)
+
+    # The burst goes out at once, then one token every 1/20s
+    assert times[1] < 0.02
+    assert 0.04 <= times[2] < 0.1
+    assert 0.09 <= times[3] < 0.15
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from quotes import CoinQuote, QuoteBook, iter_json_array
+
+ITEMS = [{'symbol': 'BTC', 'price': 67234.12}, {'symbol': 'ÉTH', 'price': 3}, 42, [1, 2], "data"]
+
+
+def chunked(text, size):
+    payload = text.encode('utf-8')
+    return [payload[offset:offset + size] for offset in range(0, len(payload), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 1 << 20])
+def test_items_across_chunk_boundaries(size):
+    text = json.dumps({'data': ITEMS, 'meta': {'count': 5}}, ensure_ascii=False)
+    assert list(iter_json_array(chunked(text, size))) == ITEMS
+
+
+def test_empty_array():
+    assert list(iter_json_array([b'{"data": []}'])) == []
+
+
+def test_only_the_top_level_key_matches():
+    document = {
+        'status': {'data': [{'symbol': 'WRONG'}]},
+        'note': 'the "data": [ field follows',
+        'list': ['data', {'data': 1}],
+        'data': [{'symbol': 'BTC'}],
+    }
+    for size in (1, 5, 4096):
+        assert list(iter_json_array(chunked(json.dumps(document), size))) == [{'symbol': 'BTC'}]
+
+
+def test_other_keys():
+    assert list(iter_json_array([b'{"data": [1], "list": [2, 3]}'], key='list')) == [2, 3]
+
+
+def test_rest_of_the_stream_is_not_read():
+    def chunks():
+        yield b'{"data": [1, 2]'
+        raise AssertionError("read past the array")
+
+    assert list(iter_json_array(chunks())) == [1, 2]
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    '{"data": [{"symbol": "BTC"}, {"symbol": "ET',
+    '{"data": [1, 2',
+    '{"meta": {"count": 2}',
+    '{"data": [1, 2,',
+])
+def test_truncated_stream_raises(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(text, 4)))
+
+
+@pytest.mark.parametrize('text', [
+    '{"error": "Invalid API key"}',
+    '{"data": null}',
+    '[{"symbol": "BTC"}]',
+])
+def test_missing_array_raises(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text.encode()]))
+
+
+def test_quote_book_keeps_the_best_ranked_symbol():
+    book = QuoteBook()
+    book.add(CoinQuote(2, 'BTC', 'Bitcoin', 1, price=100))
+    book.add(CoinQuote(9, 'BTC', 'Bitcoin Fork', 900, price=1))
+    assert book.get('BTC').price == 100
+    assert book.get(9).name == 'Bitcoin Fork'
+    assert 'BTC' in book and len(book) == 2
+    assert book.get('BTC').get('Price') == 100
+    assert book.get('BTC').get('Market Cap', 'N/A') == 'N/A'
@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from scheduler import CronExpression, Job, Scheduler, parse_cron_field
+
+
+def test_parse_cron_field():
+    assert parse_cron_field('*', 0, 5) == {0, 1, 2, 3, 4, 5}
+    assert parse_cron_field('*/15', 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field('1-5', 0, 7) == {1, 2, 3, 4, 5}
+    assert parse_cron_field('9,21', 0, 23) == {9, 21}
+    for field in ('60', '5-1', '*/0', 'x'):
+        with pytest.raises(ValueError):
+            parse_cron_field(field, 0, 59)
+
+
+def test_next_after():
+    cron = CronExpression("0 9,21 * * *")
+    assert cron.next_after(datetime(2026, 10, 18, 8, 59, 30)) == datetime(2026, 10, 18, 9, 0)
+    assert cron.next_after(datetime(2026, 10, 18, 9, 0)) == datetime(2026, 10, 18, 21, 0)
+    assert cron.next_after(datetime(2026, 12, 31, 21, 0)) == datetime(2027, 1, 1, 9, 0)
+
+
+def test_weekdays_accept_seven_for_sunday():
+    # 2026-10-18 is a Sunday
+    assert CronExpression("0 12 * * 7").next_after(datetime(2026, 10, 13)) == datetime(2026, 10, 18, 12, 0)
+    assert CronExpression("0 12 * * 0").next_after(datetime(2026, 10, 13)) == datetime(2026, 10, 18, 12, 0)
+    assert CronExpression("0 12 * * 6-7").next_after(datetime(2026, 10, 13)) == datetime(2026, 10, 17, 12, 0)
+
+
+def test_restricted_day_and_weekday_match_either():
+    # The 1st of the month or any Monday, whichever comes first
+    cron = CronExpression("0 0 1 * 1")
+    assert cron.next_after(datetime(2026, 10, 18)) == datetime(2026, 10, 19, 0, 0)
+    assert cron.next_after(datetime(2026, 10, 27)) == datetime(2026, 11, 1, 0, 0)
+
+
+def test_invalid_expressions():
+    with pytest.raises(ValueError):
+        CronExpression("0 9 * *")
+    with pytest.raises(ValueError):
+        CronExpression("0 0 31 2 *").next_after(datetime(2026, 1, 1))
+    with pytest.raises(ValueError):
+        Job("both", lambda: None, cron="* * * * *", interval=60)
+
+
+def test_job_next_run_uses_its_utc_offset():
+    job = Job("report", lambda: None, cron="0 9 * * *", utc_offset=4)
+    assert job.compute_next_run(datetime(2026, 10, 18, 4, 30, tzinfo=timezone.utc)) == \
+        datetime(2026, 10, 18, 5, 0, tzinfo=timezone.utc)
+
+
+def test_overlapping_runs_are_skipped():
+    runs = []
+
+    def slow():
+        runs.append(time.monotonic())
+        time.sleep(0.3)
+
+    scheduler = Scheduler()
+    scheduler.add_job(Job("slow", slow, interval=0.05))
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(1)
+    scheduler.stop()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    # About one run per 0.3s instead of one queued every 0.05s
+    assert 2 <= len(runs) <= 5
+    assert all(later - earlier >= 0.29 for earlier, later in zip(runs, runs[1:]))
+
+
+def test_set_jobs_keeps_unchanged_jobs():
+    scheduler = Scheduler()
+    kept = Job("kept", lambda: None, interval=60)
+    changed = Job("changed", lambda: None, interval=60)
+    scheduler.set_jobs([kept, changed, Job("removed", lambda: None, interval=60)])
+
+    scheduler.set_jobs([Job("kept", lambda: None, interval=60), Job("changed", lambda: None, interval=30)])
+    assert [job.name for job in scheduler.jobs] == ["kept", "changed"]
+    assert scheduler.jobs[0] is kept
+    assert scheduler.jobs[1] is not changed and scheduler.jobs[1].interval == 30
+
+
+def test_reload_picks_up_new_jobs():
+    first = Job("a", lambda: None, cron="0 0 1 1 *")
+    schedules = [
+        [first],
+        None,  # Unchanged
+        [Job("a", lambda: None, cron="0 0 1 1 *"), Job("b", lambda: None, interval=60)],
+    ]
+
+    def reload():
+        return schedules.pop(0) if schedules else None
+
+    scheduler = Scheduler(reload=reload, reload_interval=0.05)
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.5)
+    scheduler.stop()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert schedules == []
+    assert [job.name for job in scheduler.jobs] == ["a", "b"]
+    assert scheduler.jobs[0] is first
+
+
+def test_reload_errors_keep_the_jobs():
+    def reload():
+        raise ValueError("bad schedule")
+
+    scheduler = Scheduler(reload=reload, reload_interval=0.05)
+    scheduler.add_job(Job("a", lambda: None, cron="0 0 1 1 *"))
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.2)
+    scheduler.stop()
+    thread.join(timeout=2)
+    assert [job.name for job in scheduler.jobs] == ["a"]
@@ -0,0 +1,174 @@
+import math
+import os
+import statistics
+import struct
+
+import pytest
+
+from timeseries import (
+    TimeSeriesStore, high_low, max_drawdown, moving_average, percent_change, series_dirname, summarize, volatility,
+)
+
+DAY = 24 * 60 * 60
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TimeSeriesStore(str(tmp_path))
+
+
+def test_series_dirname():
+    assert series_dirname('USD/MDL') == 'USD_MDL'
+    assert series_dirname('BTC') == 'BTC'
+
+
+def test_append_and_read(store):
+    store.append('BTC', 100, timestamp=NOW)
+    store.append_many({'BTC': 110, 'USD/MDL': 17.8}, timestamp=NOW + 60)
+
+    assert store.series() == ['BTC', 'USD_MDL']
+    with store.open('BTC') as view:
+        assert len(view) == 2
+        assert list(view.timestamps) == [NOW, NOW + 60]
+        assert list(view.values) == [100.0, 110.0]
+        assert view.latest() == (NOW + 60, 110.0)
+    with store.open('USD/MDL') as view:
+        assert view.latest() == (NOW + 60, 17.8)
+
+
+def test_range_is_inclusive(store):
+    for index in range(5):
+        store.append('BTC', 100 + index, timestamp=NOW + index * 60)
+
+    with store.open('BTC') as view:
+        timestamps, values = view.range(NOW + 60, NOW + 180)
+        assert list(timestamps) == [NOW + 60, NOW + 120, NOW + 180]
+        assert list(values) == [101.0, 102.0, 103.0]
+        assert list(view.range(NOW + 61, NOW + 119)[1]) == []
+        assert list(view.range()[1]) == [100.0, 101.0, 102.0, 103.0, 104.0]
+        assert list(view.range(start=NOW + 200)[1]) == [104.0]
+        assert list(view.range(end=NOW)[1]) == [100.0]
+
+
+def test_value_at(store):
+    store.append('BTC', 100, timestamp=NOW)
+    store.append('BTC', 110, timestamp=NOW + 60)
+
+    with store.open('BTC') as view:
+        assert view.value_at(NOW - 1) is None
+        assert view.value_at(NOW) == 100.0
+        assert view.value_at(NOW + 59) == 100.0
+        assert view.value_at(NOW + 3600) == 110.0
+
+
+def test_missing_series_is_empty(store):
+    with store.open('NOPE') as view:
+        assert len(view) == 0
+        assert view.latest() == (None, None)
+        assert view.value_at(NOW) is None
+    assert store.series() == []
+
+
+def test_column_length_mismatch_after_a_crash(store, tmp_path):
+    store.append('BTC', 100, timestamp=NOW)
+    store.append('BTC', 110, timestamp=NOW + 60)
+    # A crash between the two writes leaves a timestamp without its value,
+    # and a partial write leaves a few stray bytes
+    with open(os.path.join(tmp_path, 'BTC', 'timestamps.bin'), 'ab') as f:
+        f.write(struct.pack('q', NOW + 120) + b'\x01\x02')
+
+    with store.open('BTC') as view:
+        assert len(view) == 2
+        assert list(view.timestamps) == [NOW, NOW + 60]
+        assert view.latest() == (NOW + 60, 110.0)
+
+
+def test_non_positive_values_are_skipped(store):
+    store.append_many({'ZERO': 0, 'NEGATIVE': -1.5, 'NONE': None, 'BTC': 100}, timestamp=NOW)
+    assert store.series() == ['BTC']
+
+
+def test_close_with_slices_alive(store):
+    store.append('BTC', 100, timestamp=NOW)
+    view = store.open('BTC')
+    _, values = view.range()
+    view.close()
+    assert list(values) == [100.0]
+
+
+def test_moving_average():
+    assert moving_average([1, 2, 3, 4], 2) == [1.5, 2.5, 3.5]
+    assert moving_average([1, 2, 3, 4], 4) == [2.5]
+    assert moving_average([1, 2], 3) == []
+    assert moving_average([1, 2], 0) == []
+
+
+def test_volatility():
+    values = [100, 110, 99, 105]
+    returns = [math.log(b / a) for a, b in zip(values, values[1:])]
+    assert volatility(values) == pytest.approx(statistics.stdev(returns))
+    assert volatility([100, 100, 100]) == 0
+    assert volatility([100, 110]) is None
+
+
+def test_volatility_ignores_non_positive_values():
+    assert volatility([0, 1, 2]) is None
+    assert volatility([0, 100, 110, 99]) == pytest.approx(volatility([100, 110, 99]))
+
+
+def test_high_low():
+    assert high_low([3, 1, 2]) == (3, 1)
+    assert high_low([]) == (None, None)
+
+
+def test_max_drawdown():
+    assert max_drawdown([100, 120, 90, 130, 65]) == pytest.approx(0.5)
+    assert max_drawdown([1, 2, 3]) == 0
+    assert max_drawdown([]) is None
+    assert max_drawdown([0, 2, 1]) == pytest.approx(0.5)
+    assert max_drawdown([0, 0]) is None
+
+
+def test_percent_change(store):
+    store.append('BTC', 100, timestamp=NOW - 2 * DAY)
+    store.append('BTC', 110, timestamp=NOW - DAY)
+    store.append('BTC', 121, timestamp=NOW)
+
+    with store.open('BTC') as view:
+        assert percent_change(view, DAY) == pytest.approx(10.0)
+        assert percent_change(view, 2 * DAY) == pytest.approx(21.0)
+        # No point close enough to the start of the window
+        assert percent_change(view, 7 * DAY) is None
+
+
+def test_percent_change_needs_a_recent_enough_start(store):
+    store.append('BTC', 100, timestamp=NOW - 2 * DAY)
+    store.append('BTC', 121, timestamp=NOW)
+
+    with store.open('BTC') as view:
+        # The point before the 24h window is 48h old, more than 1.25 windows back
+        assert percent_change(view, DAY) is None
+
+
+def test_percent_change_of_an_empty_series(store):
+    with store.open('BTC') as view:
+        assert percent_change(view, DAY) is None
+
+
+def test_summarize(store):
+    for index, value in enumerate([100, 120, 90, 110]):
+        store.append('BTC', value, timestamp=NOW - DAY + index * DAY // 3)
+
+    with store.open('BTC') as view:
+        summary = summarize(view, DAY)
+        assert summary['Price'] == 110
+        assert summary['High'] == 120
+        assert summary['Low'] == 90
+        assert summary['Average'] == pytest.approx(105)
+        assert summary['Drawdown'] == pytest.approx(0.25)
+        assert summary['Volatility'] == pytest.approx(volatility([100, 120, 90, 110]))
+        assert summary['Change (24h)'] == pytest.approx(10.0)
+        assert summary['Change (7d)'] is None
+    with store.open('NOPE') as view:
+        assert summarize(view) is None
@@ -0,0 +1,193 @@
+import math
+import os
+import re
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from mmap import mmap, ACCESS_READ
+from operator import sub, truediv
+
+# Append-only store of price snapshots: two columns per series (int64 UNIX
+# timestamps and float64 values) in flat files that are memory-mapped for reads,
+# so range queries over months of minute data never load the whole history.
+# Indicators work on memoryview slices with C-level builtins (max, min, map, accumulate).
+
+HISTORY_DIR = os.getenv("BOT_HISTORY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history"))
+TIMESTAMP_FORMAT = 'q'
+VALUE_FORMAT = 'd'
+
+
+# Helper function to map a series name (e.g. "BTC", "USD/MDL") to a directory name
+def series_dirname(series):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', series)
+
+
+# Class giving read access to one series through memory maps
+class SeriesView:
+    def __init__(self, directory):
+        self._maps = []
+        timestamps = self._map(os.path.join(directory, 'timestamps.bin'), TIMESTAMP_FORMAT)
+        values = self._map(os.path.join(directory, 'values.bin'), VALUE_FORMAT)
+        # A crash between the two writes can leave one column a row longer
+        length = min(len(timestamps), len(values))
+        self.timestamps = timestamps[:length]
+        self.values = values[:length]
+
+    def _map(self, path, fmt):
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                size -= size % struct.calcsize(fmt)
+                if size == 0:
+                    return memoryview(b'').cast(fmt)
+                mapped = mmap(f.fileno(), size, access=ACCESS_READ)
+        except FileNotFoundError:
+            return memoryview(b'').cast(fmt)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(fmt)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.timestamps.release()
+        self.values.release()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # Slices handed out are still alive, the map closes when they go away
+
+    # Function to get (timestamps, values) between start and end, both inclusive.
+    # The slices are zero-copy views valid while the SeriesView is open.
+    def range(self, start=None, end=None):
+        low = 0 if start is None else bisect_left(self.timestamps, start)
+        high = len(self.timestamps) if end is None else bisect_right(self.timestamps, end)
+        return self.timestamps[low:high], self.values[low:high]
+
+    # Function to get the last value recorded at or before `timestamp`
+    def value_at(self, timestamp):
+        index = bisect_right(self.timestamps, timestamp)
+        return self.values[index - 1] if index else None
+
+    def latest(self):
+        return (self.timestamps[-1], self.values[-1]) if len(self) else (None, None)
+
+
+# Class to append snapshots to per-series column files
+class TimeSeriesStore:
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def _series_path(self, series):
+        return os.path.join(self.directory, series_dirname(series))
+
+    # Function to append one value; timestamps must not go backwards within a series
+    def append(self, series, value, timestamp=None):
+        self.append_many({series: value}, timestamp)
+
+    # Function to append a snapshot of several series taken at the same time
+    def append_many(self, values, timestamp=None):
+        with self.lock:
+            # Taken under the lock so concurrent writers keep each series sorted
+            timestamp = int(timestamp if timestamp is not None else time.time())
+            packed_timestamp = struct.pack(TIMESTAMP_FORMAT, timestamp)
+            for series, value in values.items():
+                # Prices and rates are positive, anything else is a bad data point
+                if value is None or value <= 0:
+                    continue
+                path = self._series_path(series)
+                os.makedirs(path, exist_ok=True)
+                with open(os.path.join(path, 'timestamps.bin'), 'ab') as f:
+                    f.write(packed_timestamp)
+                with open(os.path.join(path, 'values.bin'), 'ab') as f:
+                    f.write(struct.pack(VALUE_FORMAT, float(value)))
+
+    # Function to open a series for reading, use as a context manager
+    def open(self, series):
+        return SeriesView(self._series_path(series))
+
+    def series(self):
+        try:
+            return sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+
+
+# Function to compute the simple moving average over `window` points
+def moving_average(values, window):
+    if window <= 0 or len(values) < window:
+        return []
+    sums = list(accumulate(values, initial=0.0))
+    return [total / window for total in map(sub, sums[window:], sums[:-window])]
+
+
+# Function to compute the volatility as the standard deviation of log returns
+def volatility(values):
+    values = [value for value in values if value > 0]  # Log returns need positive values
+    if len(values) < 3:
+        return None
+    returns = list(map(math.log, map(truediv, values[1:], values[:-1])))
+    mean = math.fsum(returns) / len(returns)
+    return math.sqrt(math.fsum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+
+
+# Function to get the (high, low) of a range
+def high_low(values):
+    if not len(values):
+        return None, None
+    return max(values), min(values)
+
+
+# Function to compute the maximum drawdown of a range, as a fraction of the peak
+def max_drawdown(values):
+    values = [value for value in values if value > 0]
+    if not values:
+        return None
+    peaks = list(accumulate(values, max))
+    return max(map(truediv, map(sub, peaks, values), peaks))
+
+
+# Function to compute the percent change over the last `seconds` of a series
+def percent_change(view, seconds, now=None):
+    timestamp, current = view.latest()
+    if current is None:
+        return None
+    now = now or timestamp
+    index = bisect_right(view.timestamps, now - seconds)
+    # Need a point close enough to the start of the window, e.g. within 6h for 24h
+    if not index or view.timestamps[index - 1] < now - seconds * 1.25:
+        return None
+    past = view.values[index - 1]
+    if not past:
+        return None
+    return (current - past) / past * 100
+
+
+# Function to compute the indicators shown for a series over the last `window` seconds
+def summarize(view, window=24 * 60 * 60, now=None):
+    timestamp, current = view.latest()
+    if current is None:
+        return None
+    now = now or timestamp
+    _, values = view.range(now - window, now)
+    high, low = high_low(values)
+    return {
+        'Price': current,
+        'High': high,
+        'Low': low,
+        'Average': math.fsum(values) / len(values) if len(values) else None,
+        'Volatility': volatility(values),
+        'Drawdown': max_drawdown(values),
+        'Change (24h)': percent_change(view, 24 * 60 * 60, now),
+        'Change (7d)': percent_change(view, 7 * 24 * 60 * 60, now),
+    }